@@ -0,0 +1,76 @@
+import os
+import time
+import multiprocessing
+
+import matplotlib
+matplotlib.use("Agg")   # headless: no window, figures only go to files
+import matplotlib.pyplot as plt
+
+import plot_10ASD
+import plot_20ASD
+import plot_withoutHbond
+from results_query import ResultsTable
+
+# ========== Settings ==========
+datasets = {
+    "10ASD": r"E:\new_HPMCAS\script\10ASD_new_RMSE.csv",
+    "20ASD": r"E:\new_HPMCAS\script\20ASD_new_RMSE.csv",
+}
+# figure name -> (dataset, plot script providing select() / make_figure())
+figures = {
+    "10ASD_Hbond": ("10ASD", plot_10ASD),
+    "10ASD_all": ("10ASD", plot_withoutHbond),
+    "20ASD_Hbond": ("20ASD", plot_20ASD),
+}
+percents = [0.1, 1, 10, 100]   # every figure is rendered once per percent_to_keep
+formats = ["png", "pdf"]
+output_dir = "figures"
+render = "density"             # "scatter" for the original per-point plots
+dpi = 300
+n_workers = 4                  # 1 renders in this process
+
+# 每个进程只加载一次数据：父进程加载后 fork 出的 worker 直接继承；
+# spawn 启动的 worker 第一次用到时从 .query.pkl 读取，不会重新解析 CSV
+_tables = {}
+
+def _table(dataset):
+    if dataset not in _tables:
+        _tables[dataset] = ResultsTable(datasets[dataset])
+    return _tables[dataset]
+
+def render_job(job):
+    """(figure name, percent) -> (saved paths, seconds)"""
+    name, percent = job
+    dataset, script = figures[name]
+    t0 = time.perf_counter()
+    df = script.select(_table(dataset), percent)
+    fig = script.make_figure(df, percent, render=render)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(output_dir, f"{name}_top{percent}.{fmt}")
+        fig.savefig(path, dpi=dpi)
+        paths.append(path)
+    plt.close(fig)
+    return paths, time.perf_counter() - t0
+
+def run_batch():
+    os.makedirs(output_dir, exist_ok=True)
+    for dataset in {d for d, _ in figures.values()}:
+        _table(dataset)
+    # 大比例的图最慢，先发出去，避免最后只剩一个进程在画
+    jobs = sorted(((name, p) for name in figures for p in percents), key=lambda j: -j[1])
+    pool = multiprocessing.Pool(n_workers) if n_workers > 1 else None
+    try:
+        results = pool.imap_unordered(render_job, jobs) if pool else map(render_job, jobs)
+        for paths, seconds in results:
+            print(f"{', '.join(paths)} ({seconds:.1f} s)")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return len(jobs)
+
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    n = run_batch()
+    print(f"{n} figures x {len(formats)} formats -> {output_dir} in {time.perf_counter() - t0:.1f} s")
@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+import numpy as np
+
+from frame_io import element_symbols, read_xyz
+from hbond_engine import find_hbonds
+
+# ========== Settings ==========
+# usage: python benchmark_hbonds.py <xyz directory> [10ASD|20ASD]
+folder = sys.argv[1] if len(sys.argv) > 1 else "/mnt/fastscratch/users/sgdzheng/10ASD_xyz/"
+system = sys.argv[2] if len(sys.argv) > 2 else "10ASD"
+n_frames = 50
+
+OFFSET = 109 if system == "10ASD" else 0
+sites = (124 + OFFSET, 127 + OFFSET, 125 + OFFSET, 110 + OFFSET, 116 + OFFSET)
+
+# ========== Reference implementation (original nested loops) ==========
+def distance(a, b):
+    return np.linalg.norm(a - b)
+
+def angle(a, b, c):
+    """angle a-b-c, with b as vertex"""
+    v1 = a - b
+    v2 = c - b
+    cosang = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+    return np.degrees(np.arccos(np.clip(cosang, -1.0, 1.0)))
+
+def loop_hbonds(coords, elements, donor_N, donor_H_for_N, acceptor_O,
+                donor_H, donor_H_parentO):
+    hb_124N, hb_125O, hb_110H = [], [], []
+
+    idx_N = donor_N - 1
+    idx_HN = donor_H_for_N - 1
+    for j, elem_j in enumerate(elements):
+        if j not in [idx_N, idx_HN] and elem_j in ["O", "N"]:
+            d_HA = distance(coords[idx_HN], coords[j])
+            if d_HA <= 2.5:
+                ang = angle(coords[idx_N], coords[idx_HN], coords[j])
+                if ang >= 130:
+                    hb_124N.append(f"{elem_j}{j+1}")
+
+    idx_O = acceptor_O - 1
+    for i, elem_i in enumerate(elements):
+        if elem_i == "H":
+            for j, elem_j in enumerate(elements):
+                if j != i and elem_j in ["O", "N"]:
+                    if distance(coords[j], coords[i]) < 1.2:
+                        d_HA = distance(coords[i], coords[idx_O])
+                        if d_HA <= 2.5:
+                            ang = angle(coords[j], coords[i], coords[idx_O])
+                            if ang >= 130:
+                                hb_125O.append(f"{elem_j}{j+1}")
+
+    idx_H = donor_H - 1
+    idx_OH = donor_H_parentO - 1
+    for j, elem_j in enumerate(elements):
+        if j not in [idx_H, idx_OH] and elem_j in ["O", "N"]:
+            d_HA = distance(coords[idx_H], coords[j])
+            if d_HA <= 2.5:
+                ang = angle(coords[idx_OH], coords[idx_H], coords[j])
+                if ang >= 130:
+                    hb_110H.append(f"{elem_j}{j+1}")
+
+    return hb_124N, hb_125O, hb_110H
+
+def parse_xyz(filepath):
+    with open(filepath, "r") as f:
+        lines = f.readlines()
+    atoms = []
+    for i, line in enumerate(lines[2:], start=1):
+        parts = line.split()
+        if len(parts) >= 4:
+            atom = parts[0]
+            x, y, z = map(float, parts[1:4])
+            atoms.append((i, atom, x, y, z))
+    return atoms
+
+def best_time(func, *args, repeat=5):
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def legacy_read(filepath):
+    atoms = parse_xyz(filepath)
+    coords = np.array([(x, y, z) for (_, _, x, y, z) in atoms])
+    elements = [a for (_, a, _, _, _) in atoms]
+    return coords, elements
+
+def bulk_read(filepath):
+    coords, codes = read_xyz(filepath)
+    return coords, element_symbols(codes)
+
+# ========== Parser benchmark ==========
+files = sorted(f for f in os.listdir(folder) if f.endswith(".xyz"))[:n_frames]
+paths = [os.path.join(folder, f) for f in files]
+
+t_old, t_new = 0.0, 0.0
+for path in paths:
+    ref_coords, ref_elements = legacy_read(path)
+    coords, elements = bulk_read(path)
+    if not (np.array_equal(ref_coords, coords) and list(elements) == ref_elements):
+        print(f"[!] parser mismatch in {os.path.basename(path)}")
+    t_old += best_time(legacy_read, path)
+    t_new += best_time(bulk_read, path)
+
+print(f"parse_xyz    : {t_old / len(paths) * 1e3:8.3f} ms/file")
+print(f"read_xyz     : {t_new / len(paths) * 1e3:8.3f} ms/file")
+print(f"speedup      : {t_old / t_new:8.1f}x")
+
+# ========== H-bond benchmark ==========
+frames = [(os.path.basename(p), *legacy_read(p)) for p in paths]
+
+t_loop, t_vec = 0.0, 0.0
+for fname, coords, elements in frames:
+    ref = loop_hbonds(coords, elements, *sites)
+    new = find_hbonds(coords, elements, *sites)
+    if ref != new:
+        print(f"[!] mismatch in {fname}: {ref} != {new}")
+    t_loop += best_time(loop_hbonds, coords, elements, *sites)
+    t_vec += best_time(find_hbonds, coords, elements, *sites)
+
+n = len(frames)
+print(f"{system}: {n} frames, {len(frames[0][2]) if n else 0} atoms")
+print(f"nested loops : {t_loop / n * 1e3:8.3f} ms/frame")
+print(f"vectorized   : {t_vec / n * 1e3:8.3f} ms/frame")
+print(f"speedup      : {t_loop / t_vec:8.1f}x")
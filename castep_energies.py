@@ -0,0 +1,60 @@
+import glob
+import pandas as pd
+
+from castep_io import EV_TO_HARTREE, EV_TO_KJMOL, final_energies
+from results_db import frame_key
+
+# ========== Settings ==========
+# .castep outputs of the three single-point runs of every frame
+runs = {
+    "complex": "CASTEP/complex/*.castep",
+    "polymer": "CASTEP/HPMCAS/*.castep",
+    "api": "CASTEP/Para/*.castep",
+}
+# run-specific name parts removed before matching, e.g. frame_0142_HPMCAS.castep -> frame_0142
+role_suffixes = ("_complex", "_HPMCAS", "_polymer", "_Para", "_API")
+output_csv = "20ASD_energies.csv"   # results_db.py joins it as the "energy" table
+n_workers = 1                       # e.g. 64 on a full node
+
+def match_key(path):
+    key = frame_key(path)
+    for suffix in role_suffixes:
+        if key.endswith(suffix):
+            return key[:-len(suffix)]
+    return key
+
+def binding_table(runs, n_workers=1):
+    """frame -> energies of the three runs and E_binding = E_complex - E_polymer - E_API
+
+    Frames missing one of the runs, or whose run has not finished, keep
+    NaN in the affected columns.
+    """
+    paths = {role: {match_key(p): p for p in sorted(glob.glob(pattern))}
+             for role, pattern in runs.items()}
+    frames = sorted(set().union(*paths.values()))
+    # one flat list so the pool stays busy across the three runs
+    jobs = [(role, key, p) for role, found in paths.items() for key, p in found.items()]
+    energies = final_energies([p for _, _, p in jobs], n_workers=n_workers)
+    found = {role: {} for role in runs}
+    for (role, key, _), e in zip(jobs, energies):
+        found[role][key] = e
+    ev = {role: pd.Series(found[role], dtype=float).reindex(frames) for role in runs}
+
+    binding = ev["complex"] - ev["polymer"] - ev["api"]
+    return pd.DataFrame({
+        "frame": frames,
+        "E_Complex": (ev["complex"] * EV_TO_HARTREE).to_numpy(),   # Hartree, like E_HPMCAS / E_Para
+        "E_HPMCAS": (ev["polymer"] * EV_TO_HARTREE).to_numpy(),
+        "E_Para": (ev["api"] * EV_TO_HARTREE).to_numpy(),
+        "E_Binding(eV)": binding.to_numpy(),
+        "Ebinding(kJ/mol)": (binding * EV_TO_KJMOL).to_numpy(),
+    })
+
+if __name__ == "__main__":
+    table = binding_table(runs, n_workers=n_workers)
+    missing = table[["E_Complex", "E_HPMCAS", "E_Para"]].isna()
+    for column in missing.columns:
+        if missing[column].any():
+            print(f"[⚠️] {column}: {missing[column].sum()} frames without a final energy")
+    table.to_csv(output_csv, index=False)
+    print(f"{len(table)} frames, {table['E_Binding(eV)'].notna().sum()} binding energies -> {output_csv}")
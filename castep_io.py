@@ -0,0 +1,138 @@
+import os
+import re
+import multiprocessing
+import numpy as np
+
+# ========== Units ==========
+# CASTEP prints energies in eV; the results tables keep E_HPMCAS / E_Para in Hartree
+EV_TO_HARTREE = 1 / 27.211386245988
+EV_TO_KJMOL = 96.48533212
+
+# ========== .castep output ==========
+# "Final energy, E             =  -12345.67890123     eV" (older versions: "Final energy =")
+FINAL_ENERGY = re.compile(rb"^ *Final energy(?:, E)? *= *([-+0-9.Ee]+) *eV", re.M)
+# written once the run is over; without it the last energy may belong to an unfinished geometry step
+FINISHED = re.compile(rb"^ *Total time *=", re.M)
+TAIL_BYTES = 256 * 1024
+
+def run_finished(path):
+    """True if the .castep file ends with the "Total time" summary of a completed run"""
+    if not os.path.exists(path):
+        return False
+    with open(path, "rb") as f:
+        f.seek(max(f.seek(0, os.SEEK_END) - 4096, 0))
+        return FINISHED.search(f.read()) is not None
+
+def final_energy(path, block=TAIL_BYTES, require_finished=True):
+    """last "Final energy" of a .castep file in eV (nan if the run never got there)
+
+    The file is scanned backwards in blocks, so a finished run costs one
+    read of its tail however long the SCF / geometry log above it is.
+    """
+    if require_finished and not run_finished(path):
+        return np.nan
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        carry = b""
+        while end > 0:
+            start = max(end - block, 0)
+            f.seek(start)
+            data = f.read(end - start) + carry
+            if start > 0:
+                # the first line may be cut: keep it for the next (earlier) block
+                cut = data.find(b"\n") + 1
+                carry, data = data[:cut], data[cut:]
+            matches = FINAL_ENERGY.findall(data)
+            if matches:
+                return float(matches[-1])
+            end = start
+    return np.nan
+
+def final_energies(paths, n_workers=1, chunksize=16):
+    """final_energy of every path -> float64 array in eV, read by a process pool if n_workers > 1"""
+    if n_workers > 1:
+        with multiprocessing.Pool(n_workers) as pool:
+            energies = pool.map(final_energy, paths, chunksize=chunksize)
+    else:
+        energies = [final_energy(p) for p in paths]
+    return np.array(energies, dtype=float)
+
+# ========== .magres output ==========
+_BLOCK = re.compile(r"^[\[<](/?)(\w+)[\]>]")
+
+def read_cell_symbols(path):
+    """element symbols of the POSITIONS_ABS / POSITIONS_FRAC block of a .cell, in input order"""
+    symbols, inside = [], False
+    with open(path, "r") as f:
+        for line in f:
+            words = line.split()
+            if not words:
+                continue
+            key = words[0].upper()
+            if key == "%BLOCK" and len(words) > 1 and words[1].upper().startswith("POSITIONS_"):
+                inside = True
+            elif key == "%ENDBLOCK":
+                inside = False
+            elif inside and words[0].lower() not in ("ang", "bohr", "nm"):
+                symbols.append(words[0].split(":")[0])
+    return symbols
+
+def read_magres(path, symbols=None):
+    """CASTEP .magres (magres-abinitio-v1.0) -> (symbols, isotropic shielding (n_atoms,) in ppm)
+
+    CASTEP lists the atoms grouped by species (H 1, H 2, ..., C 1, ...);
+    only the order within a species follows the input. Given the input
+    `symbols` (the .cell / frame store order), atom (species, k) is put
+    back at the k-th occurrence of that species. Without them the
+    <seed>.cell next to the .magres is used if present, otherwise the
+    grouped order of the file is kept. An atom without an ms tensor gets
+    NaN; sigma_iso is trace(sigma) / 3.
+    """
+    atoms, ms = [], []
+    block = None
+    with open(path, "r") as f:
+        for line in f:
+            m = _BLOCK.match(line)
+            if m:
+                block = None if m.group(1) else m.group(2)
+                continue
+            tokens = line.split()
+            if not tokens:
+                continue
+            if block == "atoms" and tokens[0] == "atom":
+                atoms.append((tokens[1], tokens[2], int(tokens[3])))
+            elif block == "magres" and tokens[0] == "ms":
+                ms.append(tokens[1:12])
+    if not atoms:
+        raise ValueError(f"{path}: no [atoms] block")
+    if symbols is None:
+        cell = os.path.splitext(path)[0] + ".cell"
+        symbols = read_cell_symbols(cell) if os.path.exists(cell) else [species for species, _, _ in atoms]
+    symbols = [str(s) for s in symbols]
+    if sorted(symbols) != sorted(species for species, _, _ in atoms):
+        raise ValueError(f"{path}: atoms do not match the {len(symbols)} input symbols")
+    occurrences = {}
+    for k, s in enumerate(symbols):
+        occurrences.setdefault(s, []).append(k)
+    # ms lines are keyed by label, which is the species unless the .cell gave custom labels
+    position = {(label, index): occurrences[species][index - 1] for species, label, index in atoms}
+    sigma = np.full(len(symbols), np.nan)
+    if ms:
+        tensors = np.array([r[2:] for r in ms], dtype=float).reshape(-1, 3, 3)
+        rows = [position[(r[0], int(r[1]))] for r in ms]
+        sigma[rows] = np.trace(tensors, axis1=1, axis2=2) / 3
+    return symbols, sigma
+
+def _read_magres_safe(args):
+    try:
+        return read_magres(*args)
+    except Exception as e:
+        return e
+
+def read_magres_files(paths, n_workers=1, chunksize=16, symbols=None):
+    """read_magres of every path (an exception object for files that fail), by a process pool if n_workers > 1"""
+    tasks = [(p, symbols) for p in paths]
+    if n_workers > 1:
+        with multiprocessing.Pool(n_workers) as pool:
+            return pool.map(_read_magres_safe, tasks, chunksize=chunksize)
+    return [_read_magres_safe(t) for t in tasks]
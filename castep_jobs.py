@@ -0,0 +1,314 @@
+import os
+import sys
+import time
+import shlex
+import subprocess
+from collections import Counter, defaultdict, deque
+import numpy as np
+
+from castep_io import run_finished
+from frame_io import iter_frames
+
+# ========== Settings ==========
+mode = sys.argv[1] if len(sys.argv) > 1 else "generate"   # "generate": write inputs; "run": work through the queue
+
+# --- inputs
+frames = "20ASD_frames"          # frame store, multi-frame .xyz/.pdb, .gro or .xtc/.trr (see frame_io.iter_frames)
+topology = None                  # needed for .xtc/.trr
+stride = 1                       # every N-th frame
+time_window = None               # (t_min, t_max) in ps for .gro/.xtc/.trr
+selection = None                 # frame names, or a text file with one name per line; None = every frame
+template_param = "CASTEP/frame_0142_frames1_frame0089.param"
+template_sh = "CASTEP/frame_0142_frames1_frame0089.sh"
+param_overrides = {}             # e.g. {"cut_off_energy": "600 eV"}; other keywords come from the template
+box = 30.0                       # cubic cell (Å) of frame_0142_frames1_frame0089.cell, used when vacuum is None
+kpoints = (1, 1, 1)
+# --- vacuum-box tightening: plane-wave / FFT cost grows with the cell volume, most of a 30 Å box is vacuum
+vacuum = 6.0                     # Å of vacuum on every side of the molecule (None: fixed `box`)
+orthorhombic = True              # False: cube sized by the largest extent
+snap_fft = True                  # grow each edge to the longest length with the same 2,3,5-smooth FFT grid
+# --- .gro/.xtc/.trr frames are wrapped into the periodic box: molecules are made whole before boxing
+whole_topology = None            # GROMACS .top: rebuild molecules along their bonds; None: minimum image of atom 0
+
+# --- packed launcher: many small CASTEP runs inside one allocation
+job_dir = "CASTEP/jobs"          # one sub-directory per frame: <job_dir>/<seed>/<seed>.cell / .param
+total_cores = int(os.environ.get("SLURM_NTASKS", os.cpu_count() or 1))
+cores_per_task = 4               # MPI processes per CASTEP run; total_cores // cores_per_task run at once
+# every run gets its own cores, so the default core binding of concurrent mpiruns is switched off
+castep_command = "mpirun --bind-to none -np {np} castep.mpi {seed}"
+max_retries = 2                  # a failed run is queued again at most this many times
+poll_seconds = 5.0
+
+QUEUE_FILE = "queue.txt"
+REPORT_FILE = "cell_report.csv"
+HBAR2_2M = 3.80998212           # ħ²/2mₑ in eV Å²: E = HBAR2_2M * G²
+DEFAULT_CUTOFF = 800.0          # eV, cut_off_energy of the template
+DEFAULT_GRID_SCALE = 1.75       # CASTEP default grid_scale
+MAX_BOND = 2.5                  # Å; a longer topology bond means the molecule is cut by the periodic boundary
+
+# ========== Periodic frames ==========
+def minimum_image(d, box):
+    return d - box * np.round(d / box)
+
+def make_whole(coords, box, bonds=None):
+    """PBC-wrapped frame -> coords with every molecule whole, for an orthorhombic box (3,) in Å
+
+    With bonds ((n, 2) 0-based, e.g. topology.read_topology), every bonded
+    fragment is rebuilt along its bonds by the minimum image, which works
+    for molecules of any size, and each fragment is then moved to the
+    minimum image of the first one. Without bonds every atom goes to its
+    minimum image of atom 0, which is only right if the selection spans
+    less than half the box in every direction.
+    """
+    coords = np.array(coords, dtype=float)
+    box = np.asarray(box, dtype=float)
+    if bonds is None:
+        return coords[0] + minimum_image(coords - coords[0], box)
+    if len(bonds) and np.max(bonds) >= len(coords):
+        raise ValueError(f"bonds refer to atom {np.max(bonds) + 1}, frame has {len(coords)} atoms")
+    neighbours = defaultdict(list)
+    for i, j in bonds:
+        neighbours[i].append(j)
+        neighbours[j].append(i)
+    placed = np.zeros(len(coords), dtype=bool)
+    anchor = None
+    for root in range(len(coords)):
+        if placed[root]:
+            continue
+        fragment, queue = [root], deque([root])
+        placed[root] = True
+        while queue:
+            i = queue.popleft()
+            for j in neighbours[i]:
+                if not placed[j]:
+                    coords[j] = coords[i] + minimum_image(coords[j] - coords[i], box)
+                    placed[j] = True
+                    fragment.append(j)
+                    queue.append(j)
+        centre = coords[fragment].mean(axis=0)
+        if anchor is None:
+            anchor = centre
+        else:
+            coords[fragment] += anchor + minimum_image(centre - anchor, box) - centre
+    return coords
+
+def check_whole(name, coords, box=None, bonds=None):
+    """raise if a frame still looks cut by the periodic boundary (tight_cell would measure the box, not the molecule)"""
+    if bonds is not None and len(bonds):
+        longest = np.linalg.norm(coords[bonds[:, 0]] - coords[bonds[:, 1]], axis=1).max()
+        if longest > MAX_BOND:
+            raise ValueError(f"{name}: a {longest:.1f} Å bond, the molecule is split across the periodic boundary")
+    elif box is not None:
+        extent = np.ptp(coords, axis=0)
+        if np.any(extent > np.asarray(box) / 2):
+            raise ValueError(f"{name}: spans {extent.max():.1f} Å, more than half the box; "
+                             f"set whole_topology to make it whole along its bonds")
+
+# ========== FFT grid ==========
+def param_value(param_text, keyword, default=None):
+    """number in a `keyword : value [unit]` / `keyword = value` line of a .param (commented lines ignored)"""
+    for line in param_text.splitlines():
+        key, sep, value = line.replace("=", ":").partition(":")
+        if sep and key.strip().lower() == keyword.lower() and value.split():
+            return float(value.split()[0])
+    return default
+
+def fft_smooth(n, primes=(2, 3, 5)):
+    """smallest integer >= n whose only prime factors are `primes` (fast FFT lengths)"""
+    n = max(int(n), 1)
+    while True:
+        m = n
+        for p in primes:
+            while m % p == 0:
+                m //= p
+        if m == 1:
+            return n
+        n += 1
+
+def points_per_angstrom(cutoff=DEFAULT_CUTOFF, grid_scale=DEFAULT_GRID_SCALE):
+    """grid points per Å of cell edge: the grid spans ±grid_scale·G_max, G_max = sqrt(E_cut / (ħ²/2m))"""
+    return 2 * grid_scale * np.sqrt(cutoff / HBAR2_2M) / (2 * np.pi)
+
+def fft_grid(lengths, cutoff=DEFAULT_CUTOFF, grid_scale=DEFAULT_GRID_SCALE):
+    """predicted standard FFT grid (3,) of an orthorhombic cell with edge `lengths` (Å)"""
+    density = points_per_angstrom(cutoff, grid_scale)
+    return np.array([fft_smooth(np.ceil(length * density - 1e-9)) for length in lengths])
+
+def tight_cell(coords, vacuum, cutoff=DEFAULT_CUTOFF, grid_scale=DEFAULT_GRID_SCALE,
+               orthorhombic=True, snap=True):
+    """smallest box with `vacuum` Å around the molecule -> (lattice (3, 3), centred coords, grid (3,))
+
+    coords must be whole (make_whole for PBC-wrapped MD frames), the
+    extent is taken from them as they are. Edges are extent + 2 * vacuum (all equal to the largest one unless
+    orthorhombic). With snap, each edge is stretched to the longest length
+    that still has the same 2,3,5-smooth grid size, which adds vacuum at no
+    extra cost. The molecule is moved to the centre of the box.
+    """
+    coords = np.asarray(coords, dtype=float)
+    low, high = coords.min(axis=0), coords.max(axis=0)
+    lengths = high - low + 2 * vacuum
+    if not orthorhombic:
+        lengths = np.full(3, lengths.max())
+    grid = fft_grid(lengths, cutoff, grid_scale)
+    if snap:
+        lengths = (grid - 1e-6) / points_per_angstrom(cutoff, grid_scale)
+    return np.diag(lengths), coords - (low + high) / 2 + lengths / 2, grid
+
+# ========== Inputs ==========
+def format_cell(symbols, coords, lattice, kpoints=(1, 1, 1)):
+    """.cell text in the layout of the template: k-point grid, LATTICE_CART, POSITIONS_ABS (Å)"""
+    lines = [f"kpoints_mp_grid {' '.join(str(k) for k in kpoints)}", "", "%BLOCK LATTICE_CART"]
+    lines += [" ".join(f"{v:9.6f}" for v in row) for row in np.asarray(lattice, dtype=float)]
+    lines += ["%ENDBLOCK LATTICE_CART", "", "%BLOCK POSITIONS_ABS"]
+    lines += [f"{s} " + " ".join(f"{v:9.6f}" for v in xyz) for s, xyz in zip(symbols, np.asarray(coords))]
+    lines += ["%ENDBLOCK POSITIONS_ABS", ""]
+    return "\n".join(lines) + "\n"
+
+def format_param(template, overrides=None):
+    """template .param text with `keyword : value` lines replaced (or appended) from overrides"""
+    overrides = dict(overrides or {})
+    lines = []
+    for line in template.splitlines():
+        key = line.replace("=", ":").split(":")[0].strip().lower()
+        if key in {k.lower() for k in overrides}:
+            name = next(k for k in overrides if k.lower() == key)
+            line = f"{name} : {overrides.pop(name)}"
+        lines.append(line)
+    lines += [f"{name} : {value}" for name, value in overrides.items()]
+    return "\n".join(lines) + "\n"
+
+def read_selection(selection):
+    if selection is None:
+        return None
+    if isinstance(selection, str):
+        with open(selection, "r") as f:
+            return {line.strip() for line in f if line.strip()}
+    return set(selection)
+
+def generate_jobs(named_frames, job_dir, template_param, selection=None, kpoints=(1, 1, 1),
+                  overrides=None, box=box, vacuum=None, orthorhombic=True, snap_fft=True, bonds=None):
+    """write <job_dir>/<name>/<name>.cell/.param for every selected frame -> list of seed names
+
+    named_frames yields (name, coords, elements) as frame_io.iter_frames,
+    or (name, coords, elements, md_box) with with_box=True: frames with an
+    MD box are made whole first (make_whole, along `bonds` if given), and
+    every frame is checked for molecules cut by the boundary. The seed names are also written to <job_dir>/queue.txt for run_queue.
+    With vacuum set every frame gets its own tight box (tight_cell);
+    <job_dir>/cell_report.csv lists its edges and predicted FFT grid
+    against the fixed cubic `box` at the cut_off_energy of the .param.
+    """
+    with open(template_param, "r") as f:
+        param = format_param(f.read(), overrides)
+    cutoff = param_value(param, "cut_off_energy", DEFAULT_CUTOFF)
+    grid_scale = param_value(param, "grid_scale", DEFAULT_GRID_SCALE)
+    fixed_grid = fft_grid([box] * 3, cutoff, grid_scale)
+    wanted = read_selection(selection)
+    seeds, report = [], []
+    for name, coords, elements, *md_box in named_frames:
+        if wanted is not None and name not in wanted:
+            continue
+        md_box = md_box[0] if md_box else None
+        if md_box is not None:
+            coords = make_whole(coords, md_box, bonds)
+        check_whole(name, coords, md_box, bonds)
+        if vacuum is None:
+            lattice, grid = np.eye(3) * box, fixed_grid
+        else:
+            lattice, coords, grid = tight_cell(coords, vacuum, cutoff, grid_scale, orthorhombic, snap_fft)
+        folder = os.path.join(job_dir, name)
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"{name}.cell"), "w") as f:
+            f.write(format_cell(elements, coords, lattice, kpoints))
+        with open(os.path.join(folder, f"{name}.param"), "w") as f:
+            f.write(param)
+        seeds.append(name)
+        report.append((name, *np.diag(lattice), *grid, np.prod(grid) / np.prod(fixed_grid)))
+    with open(os.path.join(job_dir, QUEUE_FILE), "w") as f:
+        f.write("\n".join(seeds) + "\n")
+    with open(os.path.join(job_dir, REPORT_FILE), "w") as f:
+        f.write("frame,a,b,c,grid_a,grid_b,grid_c,grid_fraction_of_fixed_box\n")
+        for name, a, b, c, na, nb, nc, fraction in report:
+            f.write(f"{name},{a:.4f},{b:.4f},{c:.4f},{na},{nb},{nc},{fraction:.4f}\n")
+    if report:
+        fractions = np.array([r[-1] for r in report])
+        print(f"FFT grid at {cutoff:g} eV: {'x'.join(map(str, fixed_grid))} for the {box:g} Å box; "
+              f"selected cells use {fractions.mean():.1%} of its grid points on average "
+              f"({fractions.min():.1%} - {fractions.max():.1%})")
+    return seeds
+
+def write_packed_script(template_sh, path, job_name="castep_packed"):
+    """SLURM script from the per-frame template whose CASTEP line runs this launcher instead"""
+    with open(template_sh, "r") as f:
+        lines = f.read().splitlines()
+    out = []
+    for line in lines:
+        if line.startswith("#SBATCH -J"):
+            line = f"#SBATCH -J {job_name}"
+        elif line.lstrip().startswith("mpirun"):
+            line = f"python {os.path.basename(__file__)} run"
+        out.append(line)
+    with open(path, "w") as f:
+        f.write("\n".join(out) + "\n")
+
+# ========== Packed launcher ==========
+def job_finished(job_dir, seed):
+    return run_finished(os.path.join(job_dir, seed, f"{seed}.castep"))
+
+def run_queue(job_dir, seeds=None, command=castep_command, total_cores=total_cores,
+              cores_per_task=cores_per_task, max_retries=max_retries, poll=poll_seconds):
+    """run the queued CASTEP jobs, total_cores // cores_per_task at a time -> seeds that kept failing
+
+    Runs whose .castep already ends with a completed-run summary are
+    skipped, so the same queue can simply be resubmitted when an
+    allocation runs out. A run that exits non-zero or leaves an unfinished
+    .castep goes back to the end of the queue, at most max_retries times.
+    Output of every attempt goes to <seed>/<seed>.launcher.log.
+    """
+    if seeds is None:
+        with open(os.path.join(job_dir, QUEUE_FILE), "r") as f:
+            seeds = [line.strip() for line in f if line.strip()]
+    slots = max(total_cores // cores_per_task, 1)
+    queue = deque(s for s in seeds if not job_finished(job_dir, s))
+    print(f"{len(seeds) - len(queue)} of {len(seeds)} jobs already finished, {slots} concurrent runs")
+    attempts = Counter()
+    running = {}
+    failed = []
+    while queue or running:
+        while queue and len(running) < slots:
+            seed = queue.popleft()
+            attempts[seed] += 1
+            folder = os.path.join(job_dir, seed)
+            log = open(os.path.join(folder, f"{seed}.launcher.log"), "a")
+            proc = subprocess.Popen(shlex.split(command.format(np=cores_per_task, seed=seed)),
+                                    cwd=folder, stdout=log, stderr=subprocess.STDOUT)
+            running[proc] = (seed, log)
+        time.sleep(poll)
+        for proc in [p for p in running if p.poll() is not None]:
+            seed, log = running.pop(proc)
+            log.close()
+            if proc.returncode == 0 and job_finished(job_dir, seed):
+                print(f"[✓] {seed}")
+            elif attempts[seed] <= max_retries:
+                print(f"[⚠️] {seed} failed (exit {proc.returncode}), attempt {attempts[seed]}: queued again")
+                queue.append(seed)
+            else:
+                print(f"[❌] {seed} failed {attempts[seed]} times, giving up")
+                failed.append(seed)
+    return failed
+
+if __name__ == "__main__":
+    if mode == "generate":
+        bonds = None
+        if whole_topology:
+            from topology import read_topology
+            bonds = read_topology(whole_topology)[1]
+        seeds = generate_jobs(iter_frames(frames, topology, stride, time_window, with_box=True), job_dir,
+                              template_param, selection, kpoints=kpoints, overrides=param_overrides, box=box,
+                              vacuum=vacuum, orthorhombic=orthorhombic, snap_fft=snap_fft, bonds=bonds)
+        write_packed_script(template_sh, os.path.join(job_dir, "castep_packed.sh"))
+        print(f"{len(seeds)} jobs written to {job_dir}; submit {job_dir}/castep_packed.sh from this directory")
+    elif mode == "run":
+        failed = run_queue(job_dir)
+        print(f"done, {len(failed)} jobs failed" + (f": {', '.join(failed)}" if failed else ""))
+    else:
+        raise ValueError(f"unknown mode {mode!r} (generate / run)")
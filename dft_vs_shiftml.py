@@ -0,0 +1,27 @@
+from rmse_engine import compare_sources, load_csv_dir, load_magres_dir, load_store
+
+# === Settings ===
+dataset = "20ASD"                           # experimental assignment, see experimental_shifts.DATASETS
+folder_path = "20ASD_shiftml_result"        # run_shiftml.py CSVs
+results_store = None                        # optional: run_shiftml.py columnar results directory instead of the CSVs
+magres_folder = "CASTEP/magres"             # .magres files of the CASTEP NMR runs (task : magres)
+dft_reference = None                        # {"C": (slope, intercept), "H": ...} for the GIPAW shieldings; None = ShiftML reference
+output_csv = "20ASD_DFT_vs_ShiftML.csv"
+assignment = "fixed"                        # "fixed" / "optimal", as in 20ASD_shiftml2RMSE.py
+n_workers = 1                               # processes reading the .magres files
+
+# === Main program ===
+if __name__ == "__main__":
+    if results_store:
+        names, symbols, shifts, _ = load_store(results_store)
+    else:
+        names, symbols, shifts, _ = load_csv_dir(folder_path)
+    # .magres atoms are grouped by species: put them back into the ShiftML atom order
+    dft_names, dft_symbols, dft_shifts, _ = load_magres_dir(magres_folder, dft_reference, n_workers, symbols)
+
+    # frames with both predictions are scored together in one array
+    df = compare_sources(dataset, {"ShiftML": (names, symbols, shifts),
+                                   "DFT": (dft_names, dft_symbols, dft_shifts)},
+                         assign=(assignment == "optimal"))
+    df.to_csv(output_csv, index=False)
+    print(f"{len(df)} frames with both ShiftML and DFT shifts -> {output_csv}")
@@ -0,0 +1,200 @@
+from collections import defaultdict
+
+# ========== 20ASD: 1 HPMCAS chain (1–109) + API (110–129) ==========
+# === 13C 实验值 -> Atom Index
+experiment_pairs_C_20asd = [
+    #atoms in API
+    (	24.1	,	[	123	]	)	,
+    (	171	,	[	122	]	)	,
+    (	131	,	[	121	]	)	,
+    (	121	,	[	114,129	]	)	,
+    (	116	,	[	115,118	]	)	,
+    (	154	,	[	113	]	)	,
+
+    #following atoms is the atoms in substitution
+    (	58	,	[	34,36,38,49,51,53	]	)	,
+    (	70	,	[	44	]	)	,
+    (	61	,	[	45	]	)	,
+    (	17	,	[	46	]	)	,
+    (	173	,	[	40	]	)	,
+    (	21	,	[	41	]	)	,
+    (	177	,	[	27	]	)	,
+    (	29	,	[	29	]	)	,
+    (	29	,	[	30	]	)	,
+    (	177	,	[	31	]	)	,
+
+    # #following atoms is the atom in celluloses' rings
+    (	102	,	[	13,4]	)	,
+    (	75	,	[	19,18,12,11,3,2]	)	,
+    (	84	,	[	17,	10]	)	,
+    (	61	,	[	22,	15,	6]	)	,
+    (	70	,	[	24	,16	, 9]	)	,
+]
+
+# === 1H 实验值 -> Atom Index
+experiment_pairs_H_20asd = [
+    #API
+    (1.1, [119,120,128]),
+    (7.4, [111,126]),
+    (6.8, [112,117]),
+    (8.5, [110,127]),
+    #Atoms in substitution
+    (3.0, [82,83,84, 85,86,87,	104,105,106, 101,102,103, 88,89,90,	107,108,109]),
+    (3.9, [94,95]),
+    (3.4, [96]),
+    (1.1, [91,92,93]),
+    (2.0, [77,78,79,80]),
+    #atoms in rings
+    (4.8, [72,73, 65, 57]),
+    (3.4, [71,70,74, 64,63,66, 56,55,58]),
+    (2.5, [69, 62, 54]),
+    (3.9, [75,76, 67,68, 60,61]),
+]
+
+# API 原子集合（顺序变了的话也要改这里）
+api_atoms_C_20asd = {123,122,121,114,129,115,118,113}
+api_atoms_H_20asd = {119,120,128,111,126,112,117,110,127}
+
+# ========== 10ASD: 2 HPMCAS chains (1–218) + API (219–238) ==========
+experiment_pairs_C_10asd = [
+    # HPMCAS1 (1–109)
+    (58 , [34,36,38,49,51,53]),
+    (70 , [44]),
+    (61 , [45]),
+    (17 , [46]),
+    (173, [40]),
+    (21 , [41]),
+    (177, [27]),
+    (29 , [29]),
+    (29 , [30]),
+    (177, [31]),
+    (102, [13,4]),
+    (75 , [19,18,12,11,3,2]),
+    (84 , [17,10]),
+    (61 , [22,15,6]),
+    (70 , [24,16,9]),
+    # HPMCAS2 (110–218)
+    (58 , [143,145,147,158,160,162]),
+    (70 , [153]),
+    (61 , [154]),
+    (17 , [155]),
+    (173, [149]),
+    (21 , [150]),
+    (177, [136]),
+    (29 , [138]),
+    (29 , [139]),
+    (177, [140]),
+    (102, [122,113]),
+    (75 , [128,127,121,120,112,111]),
+    (84 , [126,119]),
+    (61 , [131,124,115]),
+    (70 , [133,125,118]),
+    # API (219–238)
+    (24.1, [232]),
+    (171 , [231]),
+    (131 , [230]),
+    (121 , [223,238]),
+    (116 , [224,227]),
+    (154 , [222]),
+]
+
+experiment_pairs_H_10asd = [
+    # HPMCAS1 (1–109)
+    (3.0, [82,83,84,85,86,87,104,105,106,101,102,103,88,89,90,107,108,109]),
+    (3.9, [94,95]),
+    (3.4, [96]),
+    (1.1, [91,92,93]),
+    (2.0, [77,78,79,80]),
+    (4.8, [72,73,65,57]),
+    (3.4, [71,70,74,64,63,66,56,55,58]),
+    (2.5, [69,62,54]),
+    (3.9, [75,76,67,68,60,61]),
+    # HPMCAS2 (110–218)
+    (3.0, [191,192,193,194,195,196,213,214,215,210,211,212,197,198,199,216,217,218]),
+    (3.9, [203,204]),
+    (3.4, [205]),
+    (1.1, [200,201,202]),
+    (2.0, [186,187,188,189]),
+    (4.8, [181,182,174,166]),
+    (3.4, [180,179,183,173,172,175,165,164,167]),
+    (2.5, [178,171,163]),
+    (3.9, [184,185,176,177,169,170]),
+    # API (219–238)
+    (1.1, [228,229,237]),
+    (7.4, [220,235]),
+    (6.8, [221,226]),
+    (8.5, [219,236]),
+]
+
+# API atom sets (10ASD)
+api_atoms_C_10asd = {232,231,230,223,238,224,227,222}
+api_atoms_H_10asd = {228,229,237,220,235,221,226,219,236}
+
+# ========== Equivalent atoms ==========
+# 指认不唯一的原子组：optimal assignment 模式下，组内的预测值与实验值按最小代价重新配对
+# HPMCAS chain: atom numbers local to the chain (1–109)
+equivalent_atoms_chain = [
+    [19,18,12,11,3,2, 17,10, 24,16,9],                      # ring C2–C5 (75 / 84 / 70)
+    [72,73,65,57, 71,70,74,64,63,66,56,55,58, 69,62,54,
+     75,76,67,68,60,61],                                    # ring H (4.8 / 3.4 / 2.5 / 3.9)
+]
+# API: 20ASD numbering (API = atoms 110–129)
+equivalent_atoms_api = [
+    [114,129, 115,118],     # aromatic CH carbons (121 / 116)
+    [111,126, 112,117],     # aromatic H (7.4 / 6.8)
+]
+
+def _shifted(groups, offset):
+    return [[i + offset for i in group] for group in groups]
+
+equivalent_atoms_20asd = equivalent_atoms_chain + equivalent_atoms_api
+equivalent_atoms_10asd = (equivalent_atoms_chain + _shifted(equivalent_atoms_chain, 109)
+                          + _shifted(equivalent_atoms_api, 109))
+
+# ========== Mapping helpers ==========
+def merge_pairs_to_mapping(pairs):
+    """将 [(exp, [idxs]), ...] 合并为 {exp: [idxs...]}，避免重复键覆盖。"""
+    merged = defaultdict(list)
+    for exp_val, idx_list in pairs:
+        merged[float(exp_val)].extend(int(i) for i in idx_list)
+    # 去重但保持顺序
+    out = {}
+    for exp_val, lst in merged.items():
+        seen = set()
+        uniq = []
+        for x in lst:
+            if x not in seen:
+                seen.add(x)
+                uniq.append(x)
+        out[exp_val] = uniq
+    return out
+
+def mapping_to_one2one(experiment_mapping: dict) -> dict:
+    """把 {exp: [idx, idx,...]} 展开为 {idx: exp} 的一对一映射"""
+    out = {}
+    for exp_val, atom_list in experiment_mapping.items():
+        for idx in atom_list:
+            out[int(idx)] = float(exp_val)
+    return out
+
+# ========== Datasets ==========
+# on_missing: "nan" -> a group with a missing atom scores NaN (20ASD_shiftml2RMSE.py)
+#             "drop" -> missing atoms are left out of the group (10ASD_shiftml2RMSE.py)
+DATASETS = {
+    "20ASD": {
+        "pairs_C": experiment_pairs_C_20asd,
+        "pairs_H": experiment_pairs_H_20asd,
+        "api_C": api_atoms_C_20asd,
+        "api_H": api_atoms_H_20asd,
+        "equivalent": equivalent_atoms_20asd,
+        "on_missing": "nan",
+    },
+    "10ASD": {
+        "pairs_C": experiment_pairs_C_10asd,
+        "pairs_H": experiment_pairs_H_10asd,
+        "api_C": api_atoms_C_10asd,
+        "api_H": api_atoms_H_10asd,
+        "equivalent": equivalent_atoms_10asd,
+        "on_missing": "drop",
+    },
+}
@@ -0,0 +1,325 @@
+import os
+from collections import deque
+from itertools import islice
+import numpy as np
+
+# ========== Element codes ==========
+# element code = atomic number, stored as uint8
+ELEMENT_SYMBOLS = (
+    "X H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni "
+    "Cu Zn Ga Ge As Se Br Kr Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe"
+).split()
+ELEMENT_CODES = {sym: z for z, sym in enumerate(ELEMENT_SYMBOLS)}
+_SYMBOL_TABLE = np.array(ELEMENT_SYMBOLS)
+
+def element_codes(symbols):
+    """["C", "H", ...] -> uint8 atomic numbers"""
+    return np.array([ELEMENT_CODES[s] for s in symbols], dtype=np.uint8)
+
+def element_symbols(codes):
+    """uint8 atomic numbers -> array of element symbols"""
+    return _SYMBOL_TABLE[codes]
+
+# ========== XYZ ==========
+def _parse_xyz_block(lines):
+    """atom lines of one xyz frame -> (coords (n, 3) float64, codes (n,) uint8)"""
+    tokens = " ".join(lines).split()
+    n = len(lines)
+    if len(tokens) == 4 * n:
+        symbols = tokens[0::4]
+        del tokens[0::4]
+        xyz = np.array(tokens, dtype=float).reshape(n, 3)
+    else:
+        # extra columns (extended xyz): keep only symbol x y z
+        rows = [line.split()[:4] for line in lines]
+        symbols = [r[0] for r in rows]
+        xyz = np.array([r[1:] for r in rows], dtype=float)
+    return np.ascontiguousarray(xyz), element_codes(symbols)
+
+def _xyz_blocks(filepath, stride=1):
+    """yield (comment, atom lines) for every `stride`-th frame of a (concatenated) xyz file
+
+    The file is read line by line, so only one frame is held in memory;
+    frames in between are skipped by their line count without parsing.
+    """
+    with open(filepath, "r") as f:
+        k = 0
+        for line in f:
+            if not line.strip():
+                continue
+            n = int(line)
+            if k % stride:
+                deque(islice(f, n + 1), maxlen=0)
+            else:
+                lines = [l.rstrip("\r\n") for l in islice(f, n + 1)]
+                if len(lines) < n + 1:
+                    raise ValueError(f"{filepath}: frame {k + 1} is truncated")
+                yield lines[0], lines[1:]
+            k += 1
+
+def read_xyz(filepath):
+    """first (usually only) frame of an xyz file -> (coords, codes)"""
+    for _, block in _xyz_blocks(filepath):
+        return _parse_xyz_block(block)
+    raise ValueError(f"{filepath}: no frames found")
+
+def read_xyz_frames(filepath):
+    """all frames of a concatenated xyz -> (coords (n_frames, n_atoms, 3), codes)"""
+    coords, codes = [], None
+    for _, block in _xyz_blocks(filepath):
+        xyz, c = _parse_xyz_block(block)
+        if codes is None:
+            codes = c
+        elif not np.array_equal(c, codes):
+            raise ValueError(f"{filepath}: frame {len(coords) + 1} has a different atom list")
+        coords.append(xyz)
+    return np.stack(coords), codes
+
+def iter_xyz_frames(filepath, stride=1):
+    """yield (name, coords, elements) for every `stride`-th frame of a concatenated xyz
+
+    Streamed one frame at a time; names count every frame in the file, so
+    they stay the same whatever the stride.
+    """
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    for i, (_, block) in enumerate(_xyz_blocks(filepath, stride)):
+        coords, codes = _parse_xyz_block(block)
+        yield f"{stem}_frame{i * stride + 1:04d}", coords, element_symbols(codes)
+
+# ========== Multi-model PDB ==========
+def _pdb_element(line):
+    """element from columns 77-78, falling back to the first letter of the atom name"""
+    element = line[76:78].strip()
+    if not element:
+        element = line[12:16].strip().lstrip("0123456789")[:1]
+    return element.capitalize()
+
+def iter_pdb_frames(filepath):
+    """yield (name, coords, elements) for every MODEL of a multi-frame PDB
+
+    The file is read line by line, so only one frame is held in memory.
+    Frames are named frame_0001, frame_0002, ... as in `file conversion.ipynb`.
+    """
+    coords, elements = [], []
+    n_model = 0
+    with open(filepath, "r") as f:
+        for line in f:
+            record = line[:6]
+            if record in ("ATOM  ", "HETATM"):
+                coords.append((float(line[30:38]), float(line[38:46]), float(line[46:54])))
+                elements.append(_pdb_element(line))
+            elif record == "ENDMDL" and coords:
+                n_model += 1
+                yield f"frame_{n_model:04d}", np.array(coords), elements
+                coords, elements = [], []
+    # single-model files (or a last model without ENDMDL)
+    if coords:
+        n_model += 1
+        yield f"frame_{n_model:04d}", np.array(coords), elements
+
+# ========== GROMACS ==========
+NM_TO_ANGSTROM = 10.0
+
+def _gro_element(atom_name):
+    return atom_name.lstrip("0123456789")[:1].upper()
+
+def _gro_time(title):
+    """time in ps from a "... t= 100.00000 ..." title line (None if absent)"""
+    parts = title.replace("t=", " t= ").split()
+    if "t=" in parts and parts.index("t=") + 1 < len(parts):
+        return float(parts[parts.index("t=") + 1])
+    return None
+
+def _window_position(time, time_window):
+    """-1 before, 0 inside, 1 after the (t_min, t_max) window"""
+    if time_window is None:
+        return 0
+    if time is None:
+        raise ValueError("a time window needs frames with a time (t= in the .gro title)")
+    t_min, t_max = time_window
+    if t_min is not None and time < t_min - 1e-6:
+        return -1
+    if t_max is not None and time > t_max + 1e-6:
+        return 1
+    return 0
+
+def _select_gro(atoms, resnames, n_atoms):
+    """atom selection -> 0-based indices: None, indices, or "resname A B" (e.g. "resname API")"""
+    if atoms is None:
+        return np.arange(n_atoms)
+    if isinstance(atoms, str):
+        words = atoms.split()
+        if len(words) < 2 or words[0] != "resname":
+            raise ValueError(f"only 'resname ...' selections can be used on .gro files without MDAnalysis: {atoms!r}")
+        return np.flatnonzero(np.isin(resnames, words[1:]))
+    return np.asarray(atoms, dtype=int)
+
+def _gro_box(line):
+    """box line of a .gro -> orthorhombic edge lengths (3,) in Å"""
+    values = np.array(line.split(), dtype=float)
+    if len(values) > 3 and np.any(values[3:] != 0):
+        raise ValueError("triclinic .gro boxes are not supported")
+    return values[:3] * NM_TO_ANGSTROM
+
+def iter_gro_frames(filepath, topology=None, stride=1, time_window=None, atoms=None, with_box=False):
+    """yield (name, coords, elements) for the frames of a (multi-frame) .gro, e.g. em/nvt/npt/md.gro
+
+    Read directly, without MDAnalysis: frames outside time_window = (t_min,
+    t_max) in ps are skipped, then every `stride`-th frame is kept. Names
+    are frame_NNNN by position in the file, so they stay the same whatever
+    the stride. Elements come from the [ atoms ] masses of a .top topology
+    if given, otherwise from the atom names. Coordinates are in Å, wrapped
+    into the box as GROMACS writes them; with_box adds the box edges (3,)
+    in Å as a fourth item.
+    """
+    if topology is not None and topology.endswith(".top"):
+        from topology import read_topology
+        all_elements = np.asarray(read_topology(topology)[0])
+    else:
+        all_elements = None
+    index, elements, width = None, None, None
+    n_frame, n_kept = 0, 0
+    with open(filepath, "r") as f:
+        while True:
+            title = f.readline()
+            if not title.strip():
+                return
+            n_atoms = int(f.readline())
+            n_frame += 1
+            position = _window_position(_gro_time(title), time_window)
+            if position > 0:
+                return   # frames are in time order: nothing later can be inside the window
+            keep = position == 0
+            if keep:
+                keep = n_kept % stride == 0
+                n_kept += 1
+            if not keep:
+                for _ in range(n_atoms + 1):
+                    f.readline()
+                continue
+            lines = [f.readline() for _ in range(n_atoms)]
+            box = f.readline()
+            if index is None:
+                # precision of the coordinates: distance between the first two decimal points
+                first = lines[0]
+                width = first.index(".", first.index(".", 20) + 1) - first.index(".", 20)
+                resnames = np.array([line[5:10].strip() for line in lines])
+                index = _select_gro(atoms, resnames, n_atoms)
+                if all_elements is not None:
+                    elements = list(all_elements[index])
+                else:
+                    elements = [_gro_element(lines[i][10:15].strip()) for i in index]
+            coords = np.array([(line[20:20 + width], line[20 + width:20 + 2 * width],
+                                line[20 + 2 * width:20 + 3 * width]) for line in (lines[i] for i in index)],
+                              dtype=float) * NM_TO_ANGSTROM
+            if with_box:
+                yield f"frame_{n_frame:04d}", coords, elements, _gro_box(box)
+            else:
+                yield f"frame_{n_frame:04d}", coords, elements
+
+def _trajectory_box(ts):
+    if ts.dimensions is None:
+        return None
+    if not np.allclose(ts.dimensions[3:], 90.0):
+        raise ValueError("triclinic boxes are not supported")
+    return np.asarray(ts.dimensions[:3], dtype=float)
+
+def iter_trajectory_frames(filepath, topology, stride=1, time_window=None, atoms=None, with_box=False):
+    """yield (name, coords, elements) for every frame of a .xtc/.trr trajectory
+
+    Needs MDAnalysis; `topology` is anything it can read elements from
+    (md.tpr, md.gro, a .pdb of the system). Coordinates are in Å, wrapped
+    into the box; with_box adds the box edges (3,) in Å as a fourth item.
+    time_window = (t_min, t_max) in ps and `stride` are turned into one
+    frame slice, so skipped frames are never decoded; `atoms` is an
+    MDAnalysis selection string or 0-based indices.
+    """
+    try:
+        import MDAnalysis as mda
+    except ImportError as e:
+        raise ImportError("reading .xtc/.trr needs MDAnalysis (pip install MDAnalysis)") from e
+
+    universe = mda.Universe(topology, filepath)
+    if atoms is None:
+        atoms = universe.atoms
+    elif isinstance(atoms, str):
+        atoms = universe.select_atoms(atoms)
+    else:
+        atoms = universe.atoms[np.asarray(atoms, dtype=int)]
+    if hasattr(atoms, "elements"):
+        elements = [e.capitalize() for e in atoms.elements]
+    else:
+        elements = [name.lstrip("0123456789")[:1].upper() for name in atoms.names]
+    trajectory = universe.trajectory
+    start, stop = 0, len(trajectory)
+    if time_window is not None:
+        # mdrun writes frames at a fixed interval: time -> frame number
+        t0, dt = trajectory[0].time, trajectory.dt
+        t_min, t_max = time_window
+        if t_min is not None:
+            start = max(int(np.ceil((t_min - t0) / dt - 1e-6)), 0)
+        if t_max is not None:
+            stop = min(int(np.floor((t_max - t0) / dt + 1e-6)) + 1, stop)
+    for ts in trajectory[start:stop:stride]:
+        if with_box:
+            yield f"frame_{ts.frame + 1:04d}", atoms.positions.astype(float), elements, _trajectory_box(ts)
+        else:
+            yield f"frame_{ts.frame + 1:04d}", atoms.positions.astype(float), elements
+
+def _strided(frames, stride, atoms):
+    index = None if atoms is None else np.asarray(atoms, dtype=int)
+    for k, (name, coords, elements) in enumerate(frames):
+        if k % stride == 0:
+            if index is not None:
+                coords, elements = coords[index], [elements[i] for i in index]
+            yield name, coords, elements
+
+def _no_box(frames):
+    for name, coords, elements in frames:
+        yield name, coords, elements, None
+
+def iter_frames(filepath, topology=None, stride=1, time_window=None, atoms=None, with_box=False):
+    """dispatch on extension: .xyz, .pdb, .gro, .xtc/.trr (with a topology) or a frame store directory
+
+    stride, time_window (ps) and atoms (0-based indices; MDAnalysis /
+    "resname ..." strings for GROMACS files) apply to every format; only
+    GROMACS frames carry a time and a periodic box. with_box yields
+    (name, coords, elements, box) with box = edge lengths (3,) in Å, or
+    None for formats without one.
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == ".gro":
+        return iter_gro_frames(filepath, topology, stride, time_window, atoms, with_box)
+    if ext in (".xtc", ".trr"):
+        if topology is None:
+            raise ValueError(f"{filepath}: a topology file (e.g. md.tpr or md.gro) is needed for {ext}")
+        return iter_trajectory_frames(filepath, topology, stride, time_window, atoms, with_box)
+    if time_window is not None:
+        raise ValueError(f"{filepath}: frames have no time, time_window needs .gro/.xtc/.trr")
+    if isinstance(atoms, str):
+        raise ValueError(f"{filepath}: selection strings need .gro/.xtc/.trr, use atom indices")
+    # skipped frames are never parsed: the store is indexed, xyz frames are skipped by line count
+    if os.path.isdir(filepath):
+        from frame_store import FrameStore
+        store = FrameStore(filepath)
+        frames, stride = store.iter_frames(range(0, len(store), stride)), 1
+    elif ext == ".xyz":
+        frames, stride = iter_xyz_frames(filepath, stride), 1
+    elif ext == ".pdb":
+        frames = iter_pdb_frames(filepath)
+    else:
+        raise ValueError(f"unsupported trajectory format: {filepath}")
+    if stride > 1 or atoms is not None:
+        frames = _strided(frames, stride, atoms)
+    return _no_box(frames) if with_box else frames
+
+def read_frames(filepath, topology=None, stride=1, time_window=None, atoms=None):
+    """iter_frames stacked in memory -> (names, coords (n_frames, n_atoms, 3), elements)"""
+    names, coords, elements = [], [], None
+    for name, xyz, frame_elements in iter_frames(filepath, topology, stride, time_window, atoms):
+        names.append(name)
+        coords.append(xyz)
+        elements = frame_elements
+    if not names:
+        raise ValueError(f"{filepath}: no frames selected")
+    return names, np.stack(coords), elements
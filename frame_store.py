@@ -0,0 +1,167 @@
+import os
+import numpy as np
+
+from frame_io import element_codes, element_symbols, read_xyz
+
+# ========== Layout ==========
+# <store>/coords.npy   (n_frames, n_atoms, 3) float64, opened memory-mapped
+# <store>/codes.npy    (n_atoms,) uint8 element codes, shared by every frame
+# <store>/names.txt    frame names, one per line, in frame order
+# <store>/cells.npy    (n_frames, 3, 3) lattice vectors, only for cif imports
+DEFAULT_CELL = 30.0   # cubic box (Å) used when exporting frames without a cell
+
+class FrameStore:
+    """all frames of one composition packed into a single memory-mapped array"""
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        self.coords = np.load(os.path.join(path, "coords.npy"), mmap_mode=mode)
+        self.codes = np.load(os.path.join(path, "codes.npy"))
+        with open(os.path.join(path, "names.txt"), "r") as f:
+            self.names = f.read().splitlines()
+        cells_path = os.path.join(path, "cells.npy")
+        self.cells = np.load(cells_path, mmap_mode=mode) if os.path.exists(cells_path) else None
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def symbols(self):
+        return element_symbols(self.codes)
+
+    def index(self, name):
+        """frame number of a frame name (with or without extension)"""
+        if name not in self._index:
+            name = os.path.splitext(name)[0]
+        return self._index[name]
+
+    def __getitem__(self, key):
+        """coords of frame `key` (int or name) as a view into the memory map"""
+        if isinstance(key, str):
+            key = self.index(key)
+        return self.coords[key]
+
+    def to_atoms(self, key):
+        """frame `key` as an ase.Atoms (30 Å cubic box if the store has no cells)"""
+        from ase import Atoms
+
+        if isinstance(key, str):
+            key = self.index(key)
+        cell = self.cells[key] if self.cells is not None else [DEFAULT_CELL] * 3
+        return Atoms(numbers=self.codes, positions=self.coords[key], cell=cell, pbc=True)
+
+    def iter_frames(self, indices=None):
+        """yield (name, coords, elements) like frame_io.iter_frames"""
+        symbols = self.symbols
+        for i in range(len(self)) if indices is None else indices:
+            yield self.names[i], np.asarray(self.coords[i]), symbols
+
+# ========== Importers ==========
+def _create(path, names, codes, cells=False):
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "codes.npy"), codes)
+    with open(os.path.join(path, "names.txt"), "w") as f:
+        f.write("\n".join(names) + "\n")
+    shape = (len(names), len(codes), 3)
+    coords = np.lib.format.open_memmap(os.path.join(path, "coords.npy"), mode="w+",
+                                       dtype=np.float64, shape=shape)
+    cell_arr = None
+    if cells:
+        cell_arr = np.lib.format.open_memmap(os.path.join(path, "cells.npy"), mode="w+",
+                                             dtype=np.float64, shape=(len(names), 3, 3))
+    return coords, cell_arr
+
+def import_xyz_dir(folder, path, progress_every=1000):
+    """pack every .xyz in folder (sorted) into a frame store at `path`"""
+    files = sorted(f for f in os.listdir(folder) if f.endswith(".xyz"))
+    if not files:
+        raise ValueError(f"no .xyz files in {folder}")
+    names = [os.path.splitext(f)[0] for f in files]
+    _, codes = read_xyz(os.path.join(folder, files[0]))
+    coords, _ = _create(path, names, codes)
+    for i, fname in enumerate(files):
+        xyz, c = read_xyz(os.path.join(folder, fname))
+        if not np.array_equal(c, codes):
+            raise ValueError(f"{fname}: atom list differs from {files[0]}")
+        coords[i] = xyz
+        if progress_every and (i + 1) % progress_every == 0:
+            print(f"Imported {i + 1}/{len(files)} : {fname}")
+    coords.flush()
+    return FrameStore(path)
+
+def import_cif_dir(folder, path, progress_every=1000):
+    """pack every .cif in folder (sorted) into a frame store, keeping the cells"""
+    from ase.io import read
+
+    files = sorted(f for f in os.listdir(folder) if f.endswith(".cif"))
+    if not files:
+        raise ValueError(f"no .cif files in {folder}")
+    names = [os.path.splitext(f)[0] for f in files]
+    codes = element_codes(read(os.path.join(folder, files[0])).get_chemical_symbols())
+    coords, cells = _create(path, names, codes, cells=True)
+    for i, fname in enumerate(files):
+        atoms = read(os.path.join(folder, fname))
+        if not np.array_equal(element_codes(atoms.get_chemical_symbols()), codes):
+            raise ValueError(f"{fname}: atom list differs from {files[0]}")
+        coords[i] = atoms.get_positions()
+        cells[i] = atoms.get_cell()[:]
+        if progress_every and (i + 1) % progress_every == 0:
+            print(f"Imported {i + 1}/{len(files)} : {fname}")
+    coords.flush()
+    cells.flush()
+    return FrameStore(path)
+
+def import_frames(named_frames, path, progress_every=1000, block=4096):
+    """pack (name, coords, elements) frames, e.g. frame_io.iter_frames of md.xtc, into a frame store
+
+    The number of frames is not known up front, so coordinates are
+    streamed to a scratch file and copied block by block into coords.npy.
+    """
+    os.makedirs(path, exist_ok=True)
+    scratch = os.path.join(path, "coords.raw")
+    names, codes = [], None
+    with open(scratch, "wb") as f:
+        for name, xyz, elements in named_frames:
+            c = element_codes(elements)
+            if codes is None:
+                codes = c
+            elif not np.array_equal(c, codes):
+                raise ValueError(f"{name}: atom list differs from {names[0]}")
+            f.write(np.ascontiguousarray(xyz, dtype=np.float64).tobytes())
+            names.append(name)
+            if progress_every and len(names) % progress_every == 0:
+                print(f"Imported {len(names)} frames : {name}")
+    if not names:
+        os.remove(scratch)
+        raise ValueError("no frames to import")
+    coords, _ = _create(path, names, codes)
+    source = np.memmap(scratch, dtype=np.float64, mode="r", shape=coords.shape)
+    for start in range(0, len(names), block):
+        coords[start:start + block] = source[start:start + block]
+    coords.flush()
+    del source, coords
+    os.remove(scratch)
+    return FrameStore(path)
+
+# ========== Exporters ==========
+def export_xyz_dir(store, folder, indices=None):
+    """write frames back out as one .xyz per frame
+
+    Coordinates are written as the shortest decimal that reads back to the
+    same float64, so export_xyz_dir / import_xyz_dir round-trips exactly.
+    """
+    os.makedirs(folder, exist_ok=True)
+    for name, coords, symbols in store.iter_frames(indices):
+        with open(os.path.join(folder, f"{name}.xyz"), "w") as f:
+            f.write(f"{len(symbols)}\n{name}\n")
+            for element, xyz in zip(symbols, coords.tolist()):
+                f.write(f"{element:2s} " + " ".join(repr(v) for v in xyz) + "\n")
+
+def export_cif_dir(store, folder, indices=None):
+    """write frames back out as one .cif per frame"""
+    from ase.io import write
+
+    os.makedirs(folder, exist_ok=True)
+    for i in range(len(store)) if indices is None else indices:
+        write(os.path.join(folder, f"{store.names[i]}.cif"), store.to_atoms(i))
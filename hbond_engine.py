@@ -0,0 +1,194 @@
+import os
+import csv
+import itertools
+import multiprocessing
+import numpy as np
+
+from system_descriptor import hbond_class, is_cyclic, substituent_mask, substituent_string
+
+# ========== H-bond criteria ==========
+HBOND_CUTOFF = 2.5      # H...A distance (Å)
+ANGLE_CUTOFF = 130      # D-H...A angle (degrees)
+COVALENT_CUTOFF = 1.2   # D-H covalent bond (Å)
+POLAR_ELEMENTS = ("O", "N")
+
+# ========== Vectorized geometry ==========
+def distances(points, ref):
+    """distances from every row of points to ref"""
+    return np.linalg.norm(points - ref, axis=-1)
+
+def angles(a, b, c):
+    """angles a-b-c in degrees, with b as vertex (rows are broadcast)"""
+    v1 = a - b
+    v2 = c - b
+    cosang = np.einsum("...i,...i->...", v1, v2) / (
+        np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1))
+    return np.degrees(np.arccos(np.clip(cosang, -1.0, 1.0)))
+
+def format_labels(elements, indices):
+    """0-based atom indices -> ["O23", "N124", ...] labels (1-based)"""
+    return [f"{elements[j]}{j+1}" for j in indices]
+
+# ========== H-bond kernels ==========
+def donor_hits(coords, polar, idx_D, idx_H):
+    """indices of O/N acceptors bonded to the fixed donor D-H"""
+    cand = np.flatnonzero(polar)
+    cand = cand[(cand != idx_D) & (cand != idx_H)]
+    cand = cand[distances(coords[cand], coords[idx_H]) <= HBOND_CUTOFF]
+    if cand.size == 0:
+        return cand
+    ang = angles(coords[idx_D], coords[idx_H], coords[cand])
+    return cand[ang >= ANGLE_CUTOFF]
+
+def acceptor_hits(coords, hydrogens, polar, idx_A, bond_pairs=None):
+    """(H, D) index pairs of every D-H donating to the fixed acceptor A
+
+    Pairs come out ordered by H then D, the same order as the original
+    double loop over hydrogens and O/N atoms. If bond_pairs = (donor_H,
+    donor_D) is given (e.g. from topology.load_hbond_graph), those D-H bonds
+    are used instead of scanning for covalent bonds in every frame.
+    """
+    if bond_pairs is not None:
+        pair_H, pair_D = bond_pairs
+        near = distances(coords[pair_H], coords[idx_A]) <= HBOND_CUTOFF
+        pair_H, pair_D = pair_H[near], pair_D[near]
+    else:
+        h_idx = np.flatnonzero(hydrogens)
+        # only hydrogens close to the acceptor can form an H-bond with it
+        h_idx = h_idx[distances(coords[h_idx], coords[idx_A]) <= HBOND_CUTOFF]
+        d_idx = np.flatnonzero(polar)
+        if h_idx.size == 0 or d_idx.size == 0:
+            empty = np.empty(0, dtype=int)
+            return empty, empty
+
+        # covalent D-H bonds among the remaining hydrogens
+        d_HD = np.linalg.norm(coords[h_idx][:, None, :] - coords[d_idx][None, :, :], axis=-1)
+        rows, cols = np.nonzero(d_HD < COVALENT_CUTOFF)
+        pair_H, pair_D = h_idx[rows], d_idx[cols]
+    if pair_H.size == 0:
+        return pair_H, pair_D
+
+    ang = angles(coords[pair_D], coords[pair_H], coords[idx_A])
+    keep = ang >= ANGLE_CUTOFF
+    return pair_H[keep], pair_D[keep]
+
+def find_hbonds(coords, elements, donor_N, donor_H_for_N, acceptor_O,
+                donor_H, donor_H_parentO, bond_pairs=None):
+    """hb_124N, hb_125O, hb_110H label lists for one frame (1-based atom numbers)"""
+    coords = np.asarray(coords, dtype=float)
+    elements = np.asarray(elements)
+    polar = np.isin(elements, POLAR_ELEMENTS)
+    hydrogens = elements == "H"
+
+    # --- API amide N donor (N-H)
+    hits_N = donor_hits(coords, polar, donor_N - 1, donor_H_for_N - 1)
+
+    # --- API amide O acceptor
+    _, hits_O = acceptor_hits(coords, hydrogens, polar, acceptor_O - 1, bond_pairs)
+
+    # --- API phenolic OH donor (O-H)
+    hits_H = donor_hits(coords, polar, donor_H_parentO - 1, donor_H - 1)
+
+    return (format_labels(elements, hits_N),
+            format_labels(elements, hits_O),
+            format_labels(elements, hits_H))
+
+def analyse_hbonds(system, coords, elements, bond_pairs=None):
+    """H-bonds of every API in a compiled system (see system_descriptor)
+
+    Returns one dict per API with the hb_124N / hb_125O / hb_110H label lists,
+    the substituent bitmask and string, the cyclic H-bond flag and the
+    CLASS_BITS class mask that the plots classify with.
+    """
+    coords = np.asarray(coords, dtype=float)
+    elements = np.asarray(elements)
+    if len(elements) != system["n_atoms"]:
+        raise ValueError(f"system describes {system['n_atoms']} atoms, frame has {len(elements)}")
+    polar = np.isin(elements, POLAR_ELEMENTS)
+    hydrogens = elements == "H"
+
+    results = []
+    for donor_N, donor_H_for_N, acceptor_O, donor_H, donor_H_parentO in system["sites"]:
+        hits_N = donor_hits(coords, polar, donor_N - 1, donor_H_for_N - 1)
+        hits_O_H, hits_O = acceptor_hits(coords, hydrogens, polar, acceptor_O - 1, bond_pairs)
+        hits_H = donor_hits(coords, polar, donor_H_parentO - 1, donor_H - 1)
+        mask = substituent_mask(system, hits_N)
+        cyclic = is_cyclic(system, hits_N, hits_O_H)
+        results.append({
+            "hb_124N": format_labels(elements, hits_N),
+            "hb_125O": format_labels(elements, hits_O),
+            "hb_110H": format_labels(elements, hits_H),
+            "substituent_mask": mask,
+            "substituent": substituent_string(system, mask),
+            "cyclic": cyclic,
+            "class_mask": hbond_class(system, hits_N, cyclic, hits_N.size + hits_O.size + hits_H.size > 0),
+        })
+    return results
+
+# ========== Batch drivers ==========
+def list_frames(folder, ext=".xyz"):
+    """frame files in folder, sorted so every run sees the same order"""
+    return sorted(f for f in os.listdir(folder) if f.endswith(ext))
+
+def _apply(task):
+    func, args = task
+    return func(*args)
+
+def _batched(iterable, n):
+    it = iter(iterable)
+    while True:
+        batch = list(itertools.islice(it, n))
+        if not batch:
+            return
+        yield batch
+
+def _run_tasks(func, tasks, output_csv, n_workers, chunksize, progress_every, total=None):
+    """map func over tasks (tuples of args) and stream the rows to output_csv
+
+    Tasks are pulled from `tasks` in bounded batches, so a generator of
+    frames is never materialised. Rows keep the input order.
+    """
+    pool = multiprocessing.Pool(n_workers) if n_workers > 1 else None
+    batch_size = max(n_workers, 1) * chunksize * 4
+    count = 0
+    try:
+        with open(output_csv, "w", newline="", encoding="utf-8") as f:
+            writer = None
+            for batch in _batched(((func, t) for t in tasks), batch_size):
+                rows = pool.imap(_apply, batch, chunksize=chunksize) if pool else map(_apply, batch)
+                for row in rows:
+                    count += 1
+                    if writer is None:
+                        writer = csv.DictWriter(f, fieldnames=list(row), lineterminator=os.linesep)
+                        writer.writeheader()
+                    writer.writerow(row)
+                    if progress_every and (count % progress_every == 0 or count == total):
+                        print(f"Processed {count}/{total if total else '?'} : {row['file']}")
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+    return count
+
+def scan_folder(folder, analyse_file, output_csv, n_workers=1, chunksize=64,
+                progress_every=1):
+    """run analyse_file(path) -> row dict on every .xyz in folder
+
+    With n_workers > 1 the files are handed out to a process pool in chunks
+    of `chunksize`. Rows always come back in sorted filename order and are
+    written to output_csv as soon as they arrive, so nothing is kept in memory.
+    analyse_file must be importable by the workers (a module-level function).
+    """
+    paths = [(os.path.join(folder, f),) for f in list_frames(folder)]
+    return _run_tasks(analyse_file, paths, output_csv, n_workers, chunksize,
+                      progress_every, total=len(paths))
+
+def scan_frames(frames, analyse_frame, output_csv, n_workers=1, chunksize=64,
+                progress_every=1):
+    """run analyse_frame(name, coords, elements) -> row dict on a frame stream
+
+    `frames` is any iterable of (name, coords, elements), e.g. from
+    frame_io.iter_frames, and is consumed lazily in trajectory order.
+    """
+    return _run_tasks(analyse_frame, frames, output_csv, n_workers, chunksize,
+                      progress_every)
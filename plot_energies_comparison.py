@@ -1,22 +1,18 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from plot_helpers import class_masks
+from system_descriptor import CLASS_BITS, SUBSTITUENT_BITS
+
 def process_file(file_path):
     df = pd.read_csv(file_path)
     df_sub = df[["Substituent", "E_Binding(eV)", "whether cyclic Hbond"]].copy()
     df_sub = df_sub[df_sub["E_Binding(eV)"] < 0]  # 只保留结合能为负值
 
-    # 分类函数：只保留单一 M, P, S, A
-    def simplify_substituent(x):
-        if pd.isna(x):
-            return None
-        if "," in str(x):  # 多取代基直接丢弃
-            return None
-        if str(x) in ["M", "P", "S", "A"]:
-            return str(x)
-        return None
-
-    df_sub["Substituent_grouped"] = df_sub["Substituent"].apply(simplify_substituent)
+    # 分类：只保留单一 M, P, S, A（多取代基或 O6x 直接丢弃），按 Hbond_class 位掩码判断
+    single = {CLASS_BITS[key]: key for key in ["M", "P", "S", "A"]}
+    substituents = pd.Series(class_masks(df.loc[df_sub.index]) & SUBSTITUENT_BITS, index=df_sub.index)
+    df_sub["Substituent_grouped"] = substituents.map(single)
     df_sub = df_sub.dropna(subset=["Substituent_grouped"])
 
     # 单位换算
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from matplotlib.colors import to_rgb
+
+from system_descriptor import CLASS_BITS
+
+# ========== Settings ==========
+DENSITY_BINS = (320, 240)   # raster cells along x / y, about one marker per cell on an 8x6 in figure
+MARGIN = 0.05               # same padding matplotlib adds around a scatter
+CYCLIC_COLUMNS = ("whether cyclic Hbond", "cyclic_Hbond")
+HBOND_COLUMNS = (("124N", "125O", "110H"), ("124N_donor", "125O_acceptor", "110H_donor"))
+
+def _blank(values):
+    return values.isna().to_numpy() | (values.astype(str).str.strip() == "").to_numpy()
+
+def class_masks(df):
+    """CLASS_BITS mask of every row (see system_descriptor)
+
+    H-bond CSVs written since the Hbond_class column exists carry the mask
+    directly. Older CSVs get it rebuilt from the Substituent strings, each
+    distinct string parsed once, and the cyclic / H-bond columns.
+    """
+    if "Hbond_class" in df.columns:
+        return df["Hbond_class"].fillna(0).to_numpy(dtype=np.int64)
+    codes, uniques = pd.factorize(df["Substituent"].fillna("").astype(str))
+    table = np.array([sum(CLASS_BITS.get(label.strip(), 0) for label in set(u.split(",")))
+                      for u in uniques] + [0], dtype=np.int64)
+    mask = table[codes]   # code -1 (none) picks the trailing 0
+    cyclic = next((c for c in CYCLIC_COLUMNS if c in df.columns), None)
+    if cyclic is not None:
+        mask[(df[cyclic].astype(str).str.lower() == "true").to_numpy()] |= CLASS_BITS["cyclic"]
+    for columns in HBOND_COLUMNS:
+        if all(c in df.columns for c in columns):
+            none = _blank(df["Substituent"])
+            for c in columns:
+                none &= _blank(df[c])
+            mask[none] |= CLASS_BITS["no_hbond"]
+            break
+    return mask
+
+def data_extent(x, y, margin=MARGIN):
+    """(xmin, xmax, ymin, ymax) of all points plus margins, shared by every class raster"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ok = np.isfinite(x) & np.isfinite(y)
+    if not ok.any():
+        return 0.0, 1.0, 0.0, 1.0
+    x0, x1 = x[ok].min(), x[ok].max()
+    y0, y1 = y[ok].min(), y[ok].max()
+    dx = (x1 - x0) * margin or 0.5
+    dy = (y1 - y0) * margin or 0.5
+    return x0 - dx, x1 + dx, y0 - dy, y1 + dy
+
+def density_layer(x, y, color, extent, bins=DENSITY_BINS, alpha=0.7):
+    """RGBA raster of one class: a cell holding n points gets the opacity of n stacked markers
+
+    n markers of opacity `alpha` drawn on top of each other cover
+    1 - (1 - alpha)^n, so the raster looks like the scatter it replaces
+    while its cost only depends on the number of cells.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    counts, _, _ = np.histogram2d(x, y, bins=bins, range=[extent[:2], extent[2:]])
+    rgba = np.zeros(counts.T.shape + (4,))
+    rgba[..., :3] = to_rgb(color)
+    rgba[..., 3] = 1.0 - (1.0 - alpha) ** counts.T
+    return rgba
+
+def draw_class(ax, x, y, color, label, zorder, render="scatter", extent=None,
+               bins=DENSITY_BINS, point_size=5, alpha=0.7):
+    """one substituent class as scatter points or, with render="density", as a raster
+
+    The raster mode adds an empty scatter with the same style so the legend
+    entry (label, marker, percentage) stays as it was.
+    """
+    if render == "density":
+        if len(x):
+            ax.imshow(density_layer(x, y, color, extent, bins, alpha), extent=extent, origin="lower",
+                      aspect="auto", interpolation="nearest", zorder=zorder)
+        ax.scatter([], [], c=color, label=label, alpha=alpha, s=point_size, edgecolors="none")
+        ax.set_xlim(extent[:2])
+        ax.set_ylim(extent[2:])
+    else:
+        ax.scatter(x, y, c=color, label=label, alpha=alpha, s=point_size, edgecolors="none", zorder=zorder)
@@ -1,41 +1,50 @@
 
 
-import pandas as pd
 import matplotlib.pyplot as plt
 
-# 读取数据
+from plot_helpers import data_extent, draw_class
+from results_query import ResultsTable
+
+# 读取数据（排序索引缓存在 CSV 旁边的 .query.pkl）
 file_path = r"E:\new_HPMCAS\script\10ASD_new_RMSE.csv"
-df = pd.read_csv(file_path)
 
 # ========== 参数设置 ==========
 percent_to_keep = 100   # 比如 10 表示取最小10%的点，100 表示全部
+render = "scatter"      # "density": 先分箱成栅格再绘制，点数很多时更快、文件更小
 
 # ========== 筛选数据 ==========
-df = df.sort_values(by="Distance_to_origin", ascending=True).reset_index(drop=True)
-n_keep = int(len(df) * percent_to_keep / 100)
-if n_keep < 1:
-    n_keep = 1
-df = df.iloc[:n_keep]
+def select(table, percent_to_keep):
+    return table.top_percent("Distance_to_origin", percent_to_keep)
 
 # ========== 绘图 ==========
-plt.figure(figsize=(8, 6))
-point_size = 5
-
-plt.scatter(
-    df["API_RMSE_all"],
-    df["HPMCAS_RMSE_all"],
-    c="gray",
-    alpha=0.7,
-    s=point_size,
-    edgecolors="none"
-)
-
-plt.title("10%ASD", fontsize=18, fontweight="bold")
-
-# 坐标轴
-plt.xlabel("RMSE $_{API}$", fontsize=18, fontweight="bold")
-plt.ylabel("RMSE $_{HPMCAS}$", fontsize=18, fontweight="bold")
-
-plt.grid(True)
-plt.tight_layout()
-plt.show()
+def make_figure(df, percent_to_keep, render="scatter", system="10%ASD"):
+    """all selected rows in gray, no H-bond classes -> matplotlib Figure"""
+    fig = plt.figure(figsize=(8, 6))
+    point_size = 5
+
+    draw_class(
+        plt.gca(),
+        df["API_RMSE_all"],
+        df["HPMCAS_RMSE_all"],
+        "gray",
+        None,
+        zorder=1,
+        render=render,
+        extent=data_extent(df["API_RMSE_all"], df["HPMCAS_RMSE_all"]),
+        point_size=point_size
+    )
+
+    plt.title(system, fontsize=18, fontweight="bold")
+
+    # 坐标轴
+    plt.xlabel("RMSE $_{API}$", fontsize=18, fontweight="bold")
+    plt.ylabel("RMSE $_{HPMCAS}$", fontsize=18, fontweight="bold")
+
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+if __name__ == "__main__":
+    table = ResultsTable(file_path)
+    make_figure(select(table, percent_to_keep), percent_to_keep, render)
+    plt.show()
@@ -0,0 +1,250 @@
+import io
+import os
+import re
+import hashlib
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# ========== Settings ==========
+db_path = "20ASD_results.sqlite"
+# (table, csv): H-bond, RMSE and binding-energy outputs of the same frames
+sources = [
+    ("hbond", "20ASD_Hbond_results.csv"),
+    ("rmse", "20ASD_new_RMSE.csv"),
+    ("energy", "20ASD_energies.csv"),
+]
+output_csv = "20ASD_all_results.csv"   # joined table in the layout the plot scripts read; None to skip
+
+NAME_COLUMNS = ("File Name", "file", "Filename", "frame", "name")
+INDEX_COLUMNS = ("Distance_to_origin",)
+BLOCK_BYTES = 64 * 1024**2
+STRIP_SUFFIXES = ("_ShiftML_results.csv", ".xyz", ".cif", ".pdb", ".csv", ".castep", ".cell", ".magres")
+
+def frame_key(name):
+    """normalise a file/frame name to the join key: frame_0001_ShiftML_results.csv -> frame_0001"""
+    name = os.path.basename(str(name).replace("\\", "/"))
+    for suffix in STRIP_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _sql_type(values):
+    """declared column type from a pandas column (BOOLEAN is cast back on reading)"""
+    if pd.api.types.is_bool_dtype(values):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(values):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(values):
+        return "REAL" if values.notna().any() else ""
+    present = values.dropna()
+    if len(present) and all(isinstance(v, (bool, np.bool_)) for v in present):
+        return "BOOLEAN"
+    return "TEXT" if len(present) else ""
+
+def _sha1_prefix(f, n):
+    """sha1 of the first n bytes of an open binary file, read in blocks"""
+    h = hashlib.sha1()
+    f.seek(0)
+    while n > 0:
+        block = f.read(min(n, BLOCK_BYTES))
+        if not block:
+            break
+        h.update(block)
+        n -= len(block)
+    return h.hexdigest()
+
+def _nulls_last(order_by):
+    """ORDER BY terms with `term IS NULL` in front of every ascending one (SQLite sorts NULL first)"""
+    terms = []
+    for term in re.split(r',(?=(?:[^"]*"[^"]*")*[^"]*$)', order_by):
+        term = term.strip()
+        words = term.upper().split()
+        if words and words[-1] != "DESC" and "NULLS" not in words:
+            expr = term[:-3].rstrip() if words[-1] == "ASC" else term
+            terms.append(f"({expr}) IS NULL")
+        terms.append(term)
+    return ", ".join(terms)
+
+def _sql_value(v):
+    if v is None or (isinstance(v, float) and np.isnan(v)):
+        return None
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+class ResultsDB:
+    """per-frame H-bond / RMSE / energy tables in one SQLite file, joined by frame key
+
+    Every table is keyed by the normalised frame name (frame_key), rows are
+    upserted, and the `results` view left-joins all tables onto the list of
+    known frames. CSV sources are remembered with their size, mtime and
+    how far they were read, so re-ingesting an unchanged file is free and a
+    file that only grew (streamed H-bond / RMSE output) is read from where
+    the last ingest stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("CREATE TABLE IF NOT EXISTS frames (frame TEXT PRIMARY KEY)")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                tbl TEXT,
+                size INTEGER,
+                mtime_ns INTEGER,
+                offset INTEGER,
+                prefix_sha1 TEXT
+            )""")
+        self.db.commit()
+
+    # ---------- schema ----------
+    def tables(self):
+        rows = self.db.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                               "AND name NOT IN ('frames', 'sources') ORDER BY rowid")
+        return [r[0] for r in rows]
+
+    def columns(self, table):
+        """[(name, declared type), ...] without the frame key"""
+        info = self.db.execute(f"PRAGMA table_info({_quote(table)})").fetchall()
+        return [(r[1], r[2]) for r in info if r[1] != "frame"]
+
+    def _ensure_columns(self, table, df):
+        if table not in self.tables():
+            self.db.execute(f"CREATE TABLE {_quote(table)} (frame TEXT PRIMARY KEY)")
+        have = {name for name, _ in self.columns(table)}
+        added = False
+        for col in df.columns:
+            if col not in have:
+                self.db.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(col)} {_sql_type(df[col])}")
+                if col in INDEX_COLUMNS:
+                    self.db.execute(f"CREATE INDEX IF NOT EXISTS {_quote(f'idx_{table}_{col}')} "
+                                    f"ON {_quote(table)} ({_quote(col)})")
+                added = True
+        if added:
+            self._create_view()
+
+    def _create_view(self):
+        """results view: frames LEFT JOIN every table; a column name used by two tables gets a table prefix"""
+        tables = self.tables()
+        counts = {}
+        for t in tables:
+            for name, _ in self.columns(t):
+                counts[name] = counts.get(name, 0) + 1
+        select = ["frames.frame AS frame"]
+        joins = []
+        for k, t in enumerate(tables):
+            alias = f"t{k}"
+            joins.append(f"LEFT JOIN {_quote(t)} AS {alias} ON {alias}.frame = frames.frame")
+            for name, _ in self.columns(t):
+                label = name if counts[name] == 1 else f"{t}.{name}"
+                select.append(f"{alias}.{_quote(name)} AS {_quote(label)}")
+        self.db.execute("DROP VIEW IF EXISTS results")
+        self.db.execute(f"CREATE VIEW results AS SELECT {', '.join(select)} FROM frames "
+                        + " ".join(joins) + " ORDER BY frames.rowid")
+
+    # ---------- writing ----------
+    def upsert(self, table, df, name_column=None):
+        """insert or update the rows of df in `table`, keyed by frame_key(df[name_column])"""
+        if name_column is None:
+            name_column = next((c for c in NAME_COLUMNS if c in df.columns), df.columns[0])
+        keys = [frame_key(v) for v in df[name_column]]
+        df = df.drop(columns=[name_column])
+        self._ensure_columns(table, df)
+        cols = list(df.columns)
+        placeholders = ", ".join("?" * (len(cols) + 1))
+        names = ", ".join(["frame"] + [_quote(c) for c in cols])
+        update = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in cols)
+        sql = f"INSERT INTO {_quote(table)} ({names}) VALUES ({placeholders})"
+        sql += f" ON CONFLICT(frame) DO UPDATE SET {update}" if cols else " ON CONFLICT(frame) DO NOTHING"
+        rows = ([key] + [_sql_value(v) for v in values]
+                for key, values in zip(keys, df.itertuples(index=False, name=None)))
+        self.db.executemany(sql, rows)
+        self.db.executemany("INSERT OR IGNORE INTO frames (frame) VALUES (?)", ((k,) for k in keys))
+        self.db.commit()
+        return len(keys)
+
+    def ingest_csv(self, table, csv_path, name_column=None):
+        """upsert a CSV into `table`, reading only what changed since the last ingest -> rows read"""
+        st = os.stat(csv_path)
+        key = os.path.abspath(csv_path)
+        row = self.db.execute("SELECT tbl, size, mtime_ns, offset, prefix_sha1 FROM sources WHERE path = ?",
+                              (key,)).fetchone()
+        with open(csv_path, "rb") as f:
+            header = f.readline()
+            start = f.tell()
+            if row is not None and row[0] == table:
+                _, size, mtime_ns, offset, prefix_sha1 = row
+                if (size, mtime_ns) == (st.st_size, st.st_mtime_ns):
+                    return 0
+                if st.st_size >= offset and _sha1_prefix(f, offset) == prefix_sha1:
+                    start = offset   # the file only grew: read the new tail
+            f.seek(start)
+            n_rows, carry = 0, b""
+            while True:
+                block = f.read(BLOCK_BYTES)
+                data = carry + block
+                cut = data.rfind(b"\n") + 1
+                if not block:
+                    break   # a last line without newline is still being written: leave it for next time
+                data, carry = data[:cut], data[cut:]
+                if data.strip():
+                    df = pd.read_csv(io.BytesIO(header + data))
+                    n_rows += self.upsert(table, df, name_column)
+            end = f.tell() - len(carry)
+            prefix_sha1 = _sha1_prefix(f, end)
+        self.db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, table, st.st_size, st.st_mtime_ns, end, prefix_sha1))
+        self.db.commit()
+        return n_rows
+
+    # ---------- reading ----------
+    def _boolean_columns(self):
+        info = self.db.execute("PRAGMA table_info(results)").fetchall()
+        return [name for _, name, decl, *_ in info if decl.upper() == "BOOLEAN"]
+
+    def query(self, where=None, order_by=None, limit=None, params=()):
+        """rows of the joined `results` view as a DataFrame (BOOLEAN columns back to True/False)
+
+        Ascending order_by terms put NULLs (frames missing from a table) last.
+        """
+        if not self.tables():
+            return pd.DataFrame(columns=["frame"])
+        sql = "SELECT * FROM results"
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {_nulls_last(order_by)}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        df = pd.read_sql_query(sql, self.db, params=params)
+        for name in self._boolean_columns():
+            df[name] = df[name].map({1: True, 0: False})
+        return df
+
+    def export_csv(self, output_csv, **query):
+        """query() written as CSV, booleans as the "true"/"false" of the H-bond scripts"""
+        df = self.query(**query)
+        for name in self._boolean_columns():
+            df[name] = df[name].map({True: "true", False: "false"})
+        df.to_csv(output_csv, index=False)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+if __name__ == "__main__":
+    results = ResultsDB(db_path)
+    for table, csv_path in sources:
+        if os.path.exists(csv_path):
+            print(f"{csv_path} -> {table}: {results.ingest_csv(table, csv_path)} rows")
+        else:
+            print(f"[⚠️] {csv_path} not found, skipped")
+    if output_csv:
+        results.export_csv(output_csv)
+        print(f"joined table saved to {output_csv}")
+    results.close()
@@ -0,0 +1,87 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+# ========== Settings ==========
+SORT_COLUMNS = ("Distance_to_origin", "API_RMSE_all", "HPMCAS_RMSE_all")
+SIDECAR_SUFFIX = ".query.pkl"
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+class ResultsTable:
+    """a results CSV with persistent ascending sort orders of its score columns
+
+    The first open parses the CSV and stores the table plus one argsort
+    per score column next to it ({csv}.query.pkl); later opens load that
+    sidecar instead, and rebuild it only when the CSV has changed. Top-X%
+    queries then walk the stored order instead of sorting again.
+    """
+
+    def __init__(self, path, sort_columns=SORT_COLUMNS):
+        self.path = path
+        sidecar = path + SIDECAR_SUFFIX
+        cached = None
+        if os.path.exists(sidecar):
+            try:
+                with open(sidecar, "rb") as f:
+                    cached = pickle.load(f)
+            except Exception:
+                cached = None
+        if cached is None or cached["stamp"] != _stamp(path) \
+                or not set(sort_columns) <= set(cached["order"]):
+            df = pd.read_csv(path)
+            order = {c: np.argsort(df[c].to_numpy(), kind="stable")
+                     for c in sort_columns if c in df.columns}
+            cached = {"stamp": _stamp(path), "df": df, "order": order}
+            try:
+                with open(sidecar + ".tmp", "wb") as f:
+                    pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(sidecar + ".tmp", sidecar)
+            except OSError:
+                pass   # read-only location: the index just lives for this run
+        self.df = cached["df"]
+        self.order = cached["order"]
+
+    def __len__(self):
+        return len(self.df)
+
+    def _mask(self, where):
+        if where is None:
+            return np.ones(len(self.df), dtype=bool)
+        return np.asarray(where, dtype=bool)
+
+    def top_k(self, column, k, where=None):
+        """the k rows with the smallest `column` among rows where `where` holds, ascending
+
+        Indexed columns walk the stored order (O(n), no sort); other columns
+        use np.argpartition and sort only the k selected rows.
+        """
+        mask = self._mask(where)
+        if column in self.order:
+            order = self.order[column]
+            rows = order[mask[order]][:k]
+        else:
+            values = self.df[column].to_numpy(dtype=float)
+            candidates = np.flatnonzero(mask)
+            v = values[candidates]
+            v = np.where(np.isnan(v), np.inf, v)   # NaN last, like sort_values
+            if k < len(candidates):
+                part = np.argpartition(v, k - 1)[:k]
+            else:
+                part = np.arange(len(candidates))
+            rows = candidates[part[np.argsort(v[part], kind="stable")]]
+        return self.df.iloc[rows].reset_index(drop=True)
+
+    def top_percent(self, column, percent, where=None):
+        """smallest `percent`% of the rows passing `where` (at least one row), as the plot scripts pick them"""
+        n = int(self._mask(where).sum())
+        n_keep = max(int(n * percent / 100), 1)
+        return self.top_k(column, n_keep, where)
+
+    def threshold(self, column, percent, where=None):
+        """value of `column` at the `percent` percentile of the rows passing `where`"""
+        values = self.df[column].to_numpy(dtype=float)[self._mask(where)]
+        return float(np.nanpercentile(values, percent)) if len(values) else np.nan
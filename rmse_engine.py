@@ -0,0 +1,396 @@
+import os
+import csv
+import numpy as np
+import pandas as pd
+
+from experimental_shifts import DATASETS, mapping_to_one2one, merge_pairs_to_mapping
+from shiftml_driver import shielding_to_shift, uncertainty_to_shift
+
+RMSE_COLUMNS = [
+    'API_13C_RMSE', 'API_1H_RMSE', 'API_RMSE_all',
+    'HPMCAS_13C_RMSE', 'HPMCAS_1H_RMSE', 'HPMCAS_RMSE_all',
+]
+OUTPUT_COLUMNS = ['File Name'] + RMSE_COLUMNS + ['Distance_to_origin']
+WEIGHTED_COLUMNS = [f"{c}_weighted" for c in OUTPUT_COLUMNS[1:]]
+CI_COLUMNS = [f"{c}_CI_{end}" for c in OUTPUT_COLUMNS[1:] for end in ("low", "high")]
+CSV_SUFFIX = "_ShiftML_results.csv"
+
+# ========== Assignment -> groups ==========
+def dataset_groups(dataset):
+    """{RMSE column: [(atom, element, exp), ...]} for a dataset in experimental_shifts.DATASETS
+
+    Atoms are listed in the order the original shiftml2RMSE scripts summed
+    them, so the RMSE values come out bit-identical.
+    """
+    d = DATASETS[dataset]
+    exp_C = mapping_to_one2one(merge_pairs_to_mapping(d["pairs_C"]))
+    exp_H = mapping_to_one2one(merge_pairs_to_mapping(d["pairs_H"]))
+    api_C, api_H = d["api_C"], d["api_H"]
+    C = lambda atoms: [(i, "C", exp_C[i]) for i in atoms]
+    H = lambda atoms: [(i, "H", exp_H[i]) for i in atoms]
+
+    if d["on_missing"] == "drop":
+        # 10ASD: API atoms in set order, the merged {**C, **H} map for the combined columns
+        api_all = [(i, "C", exp_C[i]) if i in exp_C else (i, "H", exp_H[i]) for i in api_C | api_H]
+        non_all = [i for i in {**exp_C, **exp_H} if i not in api_C | api_H]
+        return {
+            'API_13C_RMSE': C(api_C),
+            'API_1H_RMSE': H(api_H),
+            'API_RMSE_all': api_all,
+            'HPMCAS_13C_RMSE': C(i for i in exp_C if i not in api_C),
+            'HPMCAS_1H_RMSE': H(i for i in exp_H if i not in api_H),
+            'HPMCAS_RMSE_all': [(i, "C", exp_C[i]) if i in exp_C else (i, "H", exp_H[i]) for i in non_all],
+        }
+    # 20ASD: mapping order, C block then H block for the combined columns
+    api_C_list = C(i for i in exp_C if i in api_C)
+    api_H_list = H(i for i in exp_H if i in api_H)
+    non_C_list = C(i for i in exp_C if i not in api_C)
+    non_H_list = H(i for i in exp_H if i not in api_H)
+    return {
+        'API_13C_RMSE': api_C_list,
+        'API_1H_RMSE': api_H_list,
+        'API_RMSE_all': api_C_list + api_H_list,
+        'HPMCAS_13C_RMSE': non_C_list,
+        'HPMCAS_1H_RMSE': non_H_list,
+        'HPMCAS_RMSE_all': non_C_list + non_H_list,
+    }
+
+# ========== Compiled scorer ==========
+def compile_scorer(groups, symbols, on_missing="nan", equivalent=()):
+    """groups -> gather-index arrays for frames with the atom list `symbols`
+
+    An atom is missing if its index is out of range or it is not of the
+    expected element. on_missing="nan" makes the whole group (and the
+    combined column it belongs to) NaN; "drop" leaves the atom out.
+
+    `equivalent` lists sets of atoms whose assignment is ambiguous; for each
+    column the positions of such a set are stored ordered by experimental
+    value, for score(..., assign=True).
+    """
+    symbols = np.asarray(symbols)
+    index, exp, bounds, classes = [], [], [0], []
+    for column in RMSE_COLUMNS:
+        atoms = groups[column]
+        found = [(i, e) for i, el, e in atoms if 0 < i <= len(symbols) and symbols[i - 1] == el]
+        if len(found) < len(atoms):
+            have = {i for i, _ in found}
+            missing = sorted(i for i, _, _ in atoms if i not in have)
+            print(f"[⚠️] {column} 缺少原子索引: {missing}")
+            if on_missing == "nan":
+                found = []
+        index.extend(i - 1 for i, _ in found)
+        exp.extend(e for _, e in found)
+        bounds.append(len(index))
+        position = {i: p for p, (i, _) in enumerate(found)}
+        column_classes = []
+        for atoms in equivalent:
+            pos = [position[i] for i in atoms if i in position]
+            values = [found[p][1] for p in pos]
+            if len(set(values)) > 1:   # one shared value: any matching costs the same
+                column_classes.append(np.array(pos, dtype=int)[np.argsort(values, kind="stable")])
+        classes.append(column_classes)
+    return {
+        "n_atoms": len(symbols),
+        "index": np.array(index, dtype=int),
+        "exp": np.array(exp, dtype=float),
+        "bounds": np.array(bounds, dtype=int),
+        "classes": classes,
+    }
+
+def dataset_scorer(dataset, symbols):
+    d = DATASETS[dataset]
+    return compile_scorer(dataset_groups(dataset), symbols, d["on_missing"], d.get("equivalent", ()))
+
+def score(scorer, shift, chunk=8192, assign=False):
+    """(n_frames, n_atoms) predicted shifts -> (n_frames, 7): RMSE_COLUMNS + Distance_to_origin
+
+    NaN shifts make the affected RMSE values NaN. With assign=True the
+    atoms of every equivalent set are matched to its experimental values
+    by minimum squared error: for a 1-D squared cost the optimal matching
+    pairs the sorted predictions with the sorted experimental values, so
+    one row-wise sort per set does it for all frames at once.
+    """
+    shift = np.atleast_2d(shift)
+    bounds = scorer["bounds"]
+    out = np.full((len(shift), len(RMSE_COLUMNS) + 1), np.nan)
+    for start in range(0, len(shift), chunk):
+        rows = slice(start, start + chunk)
+        for k in range(len(RMSE_COLUMNS)):
+            group = slice(bounds[k], bounds[k + 1])
+            if group.stop > group.start:
+                # gather per group: a contiguous (n, m) block is summed pairwise along m,
+                # exactly like the 1-D mean of the original per-file code
+                pred = np.take(shift[rows], scorer["index"][group], axis=1)
+                if assign:
+                    for pos in scorer["classes"][k]:
+                        pred[:, pos] = np.sort(pred[:, pos], axis=1)
+                sq = (scorer["exp"][group] - pred) ** 2
+                out[rows, k] = np.sqrt(sq.mean(axis=1))
+    api_all, hpmcas_all = RMSE_COLUMNS.index('API_RMSE_all'), RMSE_COLUMNS.index('HPMCAS_RMSE_all')
+    # numpy-scalar arithmetic on purpose: scalar ** 2 goes through pow(), which can differ
+    # from the array x * x in the last bit, and the original scripts used scalars here
+    out[:, -1] = [np.sqrt(a ** 2 + b ** 2) for a, b in zip(out[:, api_all], out[:, hpmcas_all])]
+    return out
+
+def _distance(rmse):
+    """Distance_to_origin from the API_RMSE_all / HPMCAS_RMSE_all columns (last axis)"""
+    api_all, hpmcas_all = RMSE_COLUMNS.index('API_RMSE_all'), RMSE_COLUMNS.index('HPMCAS_RMSE_all')
+    return np.sqrt(rmse[..., api_all] ** 2 + rmse[..., hpmcas_all] ** 2)
+
+def score_weighted(scorer, shift, shift_uncertainty, chunk=8192, assign=False, floor=1e-3):
+    """uncertainty-weighted RMSE, weights 1 / max(sigma, floor)^2 -> (n_frames, 7)
+
+    shift_uncertainty is the committee spread in shift units
+    (shiftml_driver.uncertainty_to_shift). With assign=True the
+    uncertainties follow their predictions through the optimal matching.
+    """
+    shift, shift_uncertainty = np.atleast_2d(shift), np.atleast_2d(shift_uncertainty)
+    bounds = scorer["bounds"]
+    out = np.full((len(shift), len(RMSE_COLUMNS) + 1), np.nan)
+    for start in range(0, len(shift), chunk):
+        rows = slice(start, start + chunk)
+        for k in range(len(RMSE_COLUMNS)):
+            group = slice(bounds[k], bounds[k + 1])
+            if group.stop > group.start:
+                pred = np.take(shift[rows], scorer["index"][group], axis=1)
+                unc = np.take(shift_uncertainty[rows], scorer["index"][group], axis=1)
+                if assign:
+                    for pos in scorer["classes"][k]:
+                        order = np.argsort(pred[:, pos], axis=1)
+                        pred[:, pos] = np.take_along_axis(pred[:, pos], order, axis=1)
+                        unc[:, pos] = np.take_along_axis(unc[:, pos], order, axis=1)
+                w = 1.0 / np.maximum(unc, floor) ** 2
+                sq = (scorer["exp"][group] - pred) ** 2
+                out[rows, k] = np.sqrt((w * sq).sum(axis=1) / w.sum(axis=1))
+    out[:, -1] = _distance(out[:, :-1])
+    return out
+
+def bootstrap_ci(scorer, symbols, committee, n_boot=1000, ci=95.0, seed=0, assign=False, chunk=None):
+    """committee-bootstrap confidence interval of every column -> (n_frames, 7, 2)
+
+    committee is (n_frames, n_atoms, n_committee) shielding (may be a
+    memory map). Each draw resamples the committee members with
+    replacement; the draws are a (n_boot, n_committee) count matrix, so the
+    resampled means of every frame, atom and draw come out of one matmul
+    per chunk of frames instead of a Python loop over draws. The same draws
+    are used for every frame.
+    """
+    n_frames, _, n_committee = committee.shape
+    counts = np.random.default_rng(seed).multinomial(n_committee, np.full(n_committee, 1.0 / n_committee),
+                                                     size=n_boot).astype(float) / n_committee
+    # only the atoms some column uses, positions remapped onto that subset
+    atoms, inverse = np.unique(scorer["index"], return_inverse=True)
+    sub_symbols = np.asarray(symbols)[atoms]
+    bounds = scorer["bounds"]
+    if chunk is None:   # keep the (chunk, n_used_atoms, n_boot) block around 256 MB
+        chunk = max(1, int(256 * 1024**2 / (8 * n_boot * max(len(atoms), 1))))
+    q = [(100 - ci) / 2, 100 - (100 - ci) / 2]
+    out = np.full((n_frames, len(RMSE_COLUMNS) + 1, 2), np.nan)
+    for start in range(0, n_frames, chunk):
+        rows = slice(start, min(start + chunk, n_frames))
+        # shielding -> shift is linear, so converting each member before resampling is exact
+        sub = np.asarray(committee[rows][:, atoms, :], dtype=float)               # (n, m, M)
+        sub = shielding_to_shift(sub_symbols, sub.transpose(0, 2, 1)).transpose(0, 2, 1)
+        boot = sub @ counts.T                                                      # (n, m, B)
+        rmse = np.full((len(sub), n_boot, len(RMSE_COLUMNS)), np.nan)
+        for k in range(len(RMSE_COLUMNS)):
+            group = slice(bounds[k], bounds[k + 1])
+            if group.stop > group.start:
+                pred = boot[:, inverse[group], :]
+                if assign:
+                    for pos in scorer["classes"][k]:
+                        pred[:, pos, :] = np.sort(pred[:, pos, :], axis=1)
+                rmse[..., k] = np.sqrt(((scorer["exp"][group][:, None] - pred) ** 2).mean(axis=1))
+        table = np.concatenate([rmse, _distance(rmse)[..., None]], axis=-1)   # (n, B, 7)
+        out[rows] = np.moveaxis(np.percentile(table, q, axis=1), 0, -1)
+    return out
+
+# ========== Inputs ==========
+def read_shift_csv(file_path):
+    """one run_shiftml.py CSV -> (symbols, chemical shifts, uncertainties); empty shifts become NaN"""
+    with open(file_path, "r") as f:
+        rows = [line.rstrip("\r\n").split(",") for line in f.readlines()[1:]]
+    if [int(r[0]) for r in rows] != list(range(1, len(rows) + 1)):
+        raise ValueError(f"{file_path}: Atom Index is not 1..{len(rows)}")
+    symbols = [r[1] for r in rows]
+    shift = np.array([r[3] if r[3] else "nan" for r in rows], dtype=float)
+    uncertainty = np.array([r[4] for r in rows], dtype=float)
+    return symbols, shift, uncertainty
+
+def load_csv_dir(folder, progress=None):
+    """every *.csv in folder -> (file names, symbols, (n_files, n_atoms) shifts, uncertainties)
+
+    Uncertainties are the committee spread in shielding, as in the CSVs.
+    Files that cannot be read or hold another atom list get a row of NaN.
+    """
+    files = sorted(f for f in os.listdir(folder) if f.endswith('.csv'))
+    symbols, rows = None, []
+    for csv_file in progress(files) if progress else files:
+        try:
+            file_symbols, shift, uncertainty = read_shift_csv(os.path.join(folder, csv_file))
+        except Exception as e:
+            print(f"[❌] 处理失败 {csv_file}: {e}")
+            rows.append(None)
+            continue
+        if symbols is None:
+            symbols = file_symbols
+        if file_symbols != symbols:
+            print(f"[⚠️] {csv_file} 的原子列表与其他文件不同")
+            rows.append(None)
+            continue
+        rows.append((shift, uncertainty))
+    n_atoms = len(symbols) if symbols is not None else 0
+    blank = (np.full(n_atoms, np.nan), np.full(n_atoms, np.nan))
+    rows = [blank if r is None else r for r in rows]
+    shifts = np.array([r[0] for r in rows]).reshape(len(files), n_atoms)
+    uncertainties = np.array([r[1] for r in rows]).reshape(len(files), n_atoms)
+    return files, symbols, shifts, uncertainties
+
+def load_store(path):
+    """shift_store directory -> (file names as run_shiftml.py CSVs, symbols, shifts, uncertainties)"""
+    from shift_store import ShiftResults
+    results = ShiftResults(path)
+    names = [f"{name}{CSV_SUFFIX}" for name in results.names]
+    return names, results.symbols.tolist(), results.shift, results.uncertainty
+
+def load_magres_dir(folder, reference=None, n_workers=1, symbols=None):
+    """every *.magres in folder (CASTEP NMR runs) -> (file names, symbols, (n_files, n_atoms) shifts, None)
+
+    CASTEP writes the atoms grouped by species; they are put back into the
+    input order of `symbols` (e.g. the ShiftML symbols or FrameStore.symbols),
+    or of the <seed>.cell next to each .magres if symbols is None (see
+    castep_io.read_magres). Isotropic shieldings are stacked and converted
+    with one vectorized shielding_to_shift call (`reference` = element ->
+    (slope, intercept), the ShiftML reference if None). Same layout as
+    load_csv_dir, so DFT and ShiftML shifts go through the same scorer;
+    there is no committee, hence no uncertainties. Unreadable files get a
+    row of NaN.
+    """
+    from castep_io import read_magres_files
+    files = sorted(f for f in os.listdir(folder) if f.endswith('.magres'))
+    paths = [os.path.join(folder, f) for f in files]
+    if symbols is not None:
+        symbols = [str(s) for s in symbols]
+    rows = []
+    for magres_file, result in zip(files, read_magres_files(paths, n_workers, symbols=symbols)):
+        if isinstance(result, Exception):
+            print(f"[❌] 处理失败 {magres_file}: {result}")
+            rows.append(None)
+            continue
+        file_symbols, sigma = result
+        if symbols is None:
+            symbols = file_symbols
+        if file_symbols != symbols:
+            print(f"[⚠️] {magres_file} 的原子列表与其他文件不同")
+            rows.append(None)
+            continue
+        rows.append(sigma)
+    n_atoms = len(symbols) if symbols is not None else 0
+    sigma = np.array([np.full(n_atoms, np.nan) if r is None else r for r in rows]).reshape(len(files), n_atoms)
+    if reference is None:
+        shifts = shielding_to_shift(symbols or [], sigma)
+    else:
+        shifts = shielding_to_shift(symbols or [], sigma, reference)
+    return files, symbols, shifts, None
+
+# ========== Output ==========
+def rmse_table(names, table):
+    return pd.concat([pd.DataFrame({'File Name': names}),
+                      pd.DataFrame(table, columns=OUTPUT_COLUMNS[1:])], axis=1)
+
+def score_files(dataset, names, symbols, shifts, assign=False, uncertainties=None,
+                results_store=None, n_bootstrap=0, ci=95.0, seed=0):
+    """names + stacked shifts -> RMSE DataFrame in the *_new_RMSE.csv layout
+
+    With `uncertainties` (committee spread in shielding) the *_weighted
+    columns are added; with n_bootstrap > 0 the *_CI_low / *_CI_high
+    columns are added from the committee kept in results_store.
+    """
+    if symbols is None:
+        return rmse_table(names, np.full((len(names), len(OUTPUT_COLUMNS) - 1), np.nan))
+    scorer = dataset_scorer(dataset, symbols)
+    df = rmse_table(names, score(scorer, shifts, assign=assign))
+    if uncertainties is not None:
+        weighted = score_weighted(scorer, shifts, uncertainty_to_shift(symbols, uncertainties), assign=assign)
+        df = pd.concat([df, pd.DataFrame(weighted, columns=WEIGHTED_COLUMNS)], axis=1)
+    if n_bootstrap:
+        if results_store is None:
+            raise ValueError("bootstrap needs the committee predictions of a results_store")
+        from shift_store import ShiftResults
+        results = ShiftResults(results_store)
+        if results.names != [name[:-len(CSV_SUFFIX)] for name in names]:
+            raise ValueError(f"{results_store} does not hold the frames being scored")
+        intervals = np.concatenate([
+            bootstrap_ci(scorer, symbols, block, n_boot=n_bootstrap, ci=ci, seed=seed, assign=assign)
+            for _, block in results.iter_committee()]).reshape(len(names), -1)
+        df = pd.concat([df, pd.DataFrame(intervals, columns=CI_COLUMNS)], axis=1)
+    return df
+
+def _frame_name(name):
+    for suffix in (CSV_SUFFIX, ".magres", ".csv"):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def compare_sources(dataset, sources, assign=False):
+    """score several predictions of the same frames in one pass, e.g. ShiftML and CASTEP (DFT)
+
+    sources: {label: (names, symbols, shifts)} as returned by the load_*
+    functions. Frames present in every source are stacked into one array
+    and scored together; the table has one row per frame with the RMSE
+    columns of every source suffixed _<label>, plus, for two sources, the
+    per-frame RMS deviation between them for 13C and 1H.
+    """
+    labels = list(sources)
+    symbols = sources[labels[0]][1]
+    for label in labels[1:]:
+        if sources[label][1] != symbols:
+            raise ValueError(f"{label} and {labels[0]} do not have the same atom list")
+    rows = {label: {_frame_name(n): k for k, n in enumerate(names)} for label, (names, _, _) in sources.items()}
+    frames = sorted(set.intersection(*(set(r) for r in rows.values())))
+    stacked = np.stack([sources[label][2][[rows[label][f] for f in frames]] for label in labels])
+    scores = score(dataset_scorer(dataset, symbols), stacked.reshape(-1, len(symbols)), assign=assign)
+    scores = scores.reshape(len(labels), len(frames), -1)
+
+    df = pd.DataFrame({"frame": frames})
+    for label, table in zip(labels, scores):
+        df = pd.concat([df, pd.DataFrame(table, columns=[f"{c}_{label}" for c in OUTPUT_COLUMNS[1:]])], axis=1)
+    if len(labels) == 2:
+        symbols = np.asarray(symbols)
+        for element, column in (("C", "13C"), ("H", "1H")):
+            diff = stacked[0][:, symbols == element] - stacked[1][:, symbols == element]
+            with np.errstate(invalid="ignore"):
+                df[f"{column}_RMSD_{labels[0]}_vs_{labels[1]}"] = np.sqrt(np.nanmean(diff ** 2, axis=1)) \
+                    if diff.shape[1] else np.nan
+    return df
+
+class RMSEWriter:
+    """append RMSE rows to a *_new_RMSE.csv as frames are scored (fused run_shiftml.py mode)
+
+    `done` holds the file names already in the table, so a resumed run can
+    skip them; a row cut off by a killed job is dropped on reopening.
+    """
+
+    def __init__(self, output_csv):
+        self.done = set()
+        if os.path.exists(output_csv) and os.path.getsize(output_csv) > 0:
+            with open(output_csv, "rb+") as f:
+                data = f.read()
+                if not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+            with open(output_csv, "r", newline="") as f:
+                self.done = {row[0] for row in list(csv.reader(f))[1:]}
+        new = not os.path.exists(output_csv) or os.path.getsize(output_csv) == 0
+        self.f = open(output_csv, "a", newline="")
+        self.writer = csv.writer(self.f, lineterminator=os.linesep)
+        if new:
+            self.writer.writerow(OUTPUT_COLUMNS)
+
+    def append(self, name, values):
+        """one row: file name + RMSE_COLUMNS + Distance_to_origin, NaN written as an empty cell"""
+        self.writer.writerow([name] + ["" if np.isnan(v) else repr(float(v)) for v in values])
+        self.f.flush()
+        self.done.add(name)
+
+    def close(self):
+        self.f.close()
@@ -1,65 +1,136 @@
 from ase.io import read
-from shiftml.ase import ShiftML
-import numpy as np
-import csv
 import os
+import numpy as np
+
+from frame_store import FrameStore
+from rmse_engine import CSV_SUFFIX, RMSEWriter, dataset_scorer, score
+from shift_store import ShiftResultWriter
+from shiftml_cache import PredictionCache
+from shiftml_driver import (iter_predictions, load_model, shielding_to_shift,
+                            start_workers, write_shift_csv)
 
-# 初始化 ShiftML 模型
-calculator = ShiftML("ShiftML3")
+# ShiftML 模型与并行设置
+model_name = "ShiftML3"
+n_workers = 1            # >1 时启动多个进程，每个进程各自加载一次模型（无 GPU 的 64 核节点可用 64 x 1 或 16 x 4）
+threads_per_worker = 1   # 每个 worker 的 torch intra-op 线程数（单进程时不限制）
 
 # 输入/输出路径
 input_folder = "20ASD"
 output_folder = "20ASD_shiftml"
-os.makedirs(output_folder, exist_ok=True)
-
-# 找到所有 .cif 文件
-cif_files = [f for f in os.listdir(input_folder) if f.endswith(".cif")]
-
-for idx, input_file in enumerate(cif_files, 1):
-    input_path = os.path.join(input_folder, input_file)
-    base_name = os.path.splitext(input_file)[0]
-    output_csv = os.path.join(output_folder, f"{base_name}_ShiftML_results.csv")
-
-    # 读取结构
-    frame = read(input_path)
-
-    # 预测屏蔽值和不确定性
-    cs_iso = np.array(calculator.get_cs_iso(frame))
-    cs_committee_iso = calculator.get_cs_iso_ensemble(frame)
-    uncertainty = np.std(cs_committee_iso, axis=1)
-    atom_types = frame.get_chemical_symbols()
-
-    # 收集当前文件结果
-    csv_rows = []
-    for i, (atom_type, sigma, unc) in enumerate(zip(atom_types, cs_iso, uncertainty)):
-        if atom_type == "C":
-            shift = -0.9732 * sigma + 166.23
-        elif atom_type == "H":
-            shift = -0.9024 * sigma + 28.05
-        elif atom_type == "N":
-            shift = -1.0250 * sigma + 183.34
+results_store = "20ASD_shiftml_results"   # 列式结果目录（shift_store）：shielding/shift/uncertainty 各为 (n_frames, n_atoms)
+output_format = "both"  # "npz" 只写 results_store，"csv" 只写逐结构 CSV（旧格式，*_shiftml2RMSE.py 默认读取），"both" 两者都写，"none" 不写逐原子结果
+keep_committee = True   # results_store 中同时保存完整 committee 预测（按需 mmap 读取）
+input_store = None   # 可选：frame store 目录（frame_store.import_cif_dir 生成），设置后不再逐个读取 .cif
+batch_size = 8       # 每次模型调用处理的结构数（committee 只运行一次，均值和不确定性都从中得到）
+skip_existing = True  # 已有结果的结构直接跳过（作业中断后可续算）
+cache_path = "shiftml_cache.sqlite"   # 预测缓存（按元素 + 坐标哈希），None 表示不用缓存
+cache_max_gb = 2.0
+
+# 可选：预测后直接在内存中计算 RMSE（不经过中间文件），逐帧追加到 RMSE 表
+score_dataset = None            # "20ASD" / "10ASD"（experimental_shifts.DATASETS），None 表示不计算
+rmse_csv = "20ASD_new_RMSE.csv"
+score_assignment = "fixed"      # "optimal": 等价原子组内按最小代价重新配对（见 20ASD_shiftml2RMSE.py）
+
+write_csv = output_format in ("csv", "both")
+write_npz = output_format in ("npz", "both")
+if not (write_csv or write_npz or score_dataset):
+    raise ValueError('output_format = "none" needs score_dataset')
+if write_csv:
+    os.makedirs(output_folder, exist_ok=True)
+
+def output_path(base_name):
+    return os.path.join(output_folder, f"{base_name}_ShiftML_results.csv")
+
+def is_done(base_name, store_done=(), rmse_done=()):
+    """每种开启的输出（results_store / CSV / RMSE 表）里都已有该结构"""
+    if write_npz and base_name not in store_done:
+        return False
+    if write_csv and not os.path.exists(output_path(base_name)):
+        return False
+    if score_dataset and f"{base_name}{CSV_SUFFIX}" not in rmse_done:
+        return False
+    return True
+
+def iter_structures(base_names, store=None, store_done=(), rmse_done=()):
+    """按顺序读取结构 -> (base_name, ase.Atoms)，跳过已完成的结构"""
+    for i, base_name in enumerate(base_names):
+        if skip_existing and is_done(base_name, store_done, rmse_done):
+            continue
+        if store is not None:
+            yield base_name, store.to_atoms(i)
         else:
-            shift = np.nan
-        atom_index = i + 1
-        csv_rows.append([atom_index, atom_type, sigma, shift, unc])
-
-    # 写入 CSV 文件
-    with open(output_csv, mode="w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "Atom Index", "Atom Type", 
-            "Shielding (ppm)", "Chemical Shift (ppm)", "Uncertainty (ppm)"
-        ])
-        for row in csv_rows:
-            writer.writerow([
-                row[0],
-                row[1],
-                f"{row[2]:.6f}",   # 保留 6 位小数，避免精度丢失
-                f"{row[3]:.6f}" if not np.isnan(row[3]) else "",
-                f"{row[4]:.6f}"
-            ])
-
-    # 打印进度提示
-    print(f"{input_file} 计算完成 ({idx}/{len(cif_files)})")
-
-print(f"\n全部完成！结果保存在文件夹: {output_folder}")
+            yield base_name, read(os.path.join(input_folder, f"{base_name}.cif"))
+
+if __name__ == "__main__":
+    if input_store:
+        store = FrameStore(input_store)
+        base_names = store.names
+    else:
+        store = None
+        # 找到所有 .cif 文件
+        cif_files = sorted(f for f in os.listdir(input_folder) if f.endswith(".cif"))
+        base_names = [os.path.splitext(f)[0] for f in cif_files]
+
+    # 初始化 ShiftML 模型（并行时由每个 worker 各自加载）
+    if n_workers > 1:
+        pool = start_workers(model_name, n_workers, threads_per_worker)
+        calculator = None
+    else:
+        pool = None
+        calculator = load_model(model_name)
+
+    cache = PredictionCache(cache_path, model_name, max_bytes=int(cache_max_gb * 1024**3)) if cache_path else None
+
+    # 已有的列式结果（续算时跳过其中的结构）
+    writer = None
+    store_done = set()
+    if write_npz and os.path.exists(os.path.join(results_store, "symbols.npy")):
+        writer = ShiftResultWriter(results_store, np.load(os.path.join(results_store, "symbols.npy")),
+                                   keep_committee=keep_committee)
+        store_done = writer.done
+
+    # RMSE 表（已有的行续算时跳过）；实验值映射在第一帧时编译一次
+    rmse = RMSEWriter(rmse_csv) if score_dataset else None
+    rmse_done = rmse.done if rmse is not None else set()
+    scorer = None
+
+    # 预测屏蔽值和不确定性（按批次）；出错或中断时也要把已算完的结果写出
+    try:
+        structures = iter_structures(base_names, store, store_done, rmse_done)
+        predictions = iter_predictions(calculator, structures, batch_size=batch_size, cache=cache, pool=pool)
+        for idx, (base_name, frame, sigma, uncertainty, committee) in enumerate(predictions, 1):
+            atom_types = frame.get_chemical_symbols()
+            shift = shielding_to_shift(atom_types, sigma)
+
+            # 写入结果
+            if write_npz:
+                if writer is None:
+                    writer = ShiftResultWriter(results_store, atom_types, keep_committee=keep_committee)
+                if base_name not in writer.done:
+                    writer.append(base_name, sigma, uncertainty, committee, shift=shift)
+            if write_csv:
+                write_shift_csv(output_path(base_name), atom_types, sigma, shift, uncertainty)
+
+            # 直接打分
+            if rmse is not None and f"{base_name}{CSV_SUFFIX}" not in rmse.done:
+                if scorer is None:
+                    scorer = dataset_scorer(score_dataset, atom_types)
+                rmse.append(f"{base_name}{CSV_SUFFIX}", score(scorer, shift, assign=(score_assignment == "optimal"))[0])
+
+            # 打印进度提示
+            print(f"{base_name} 计算完成 ({idx}/{len(base_names)})")
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if writer is not None:
+            writer.close()
+        if rmse is not None:
+            rmse.close()
+        if cache is not None:
+            cache.close()
+    outputs = [results_store] * write_npz + [output_folder] * write_csv + [rmse_csv] * bool(score_dataset)
+    print(f"\n全部完成！结果保存在: {', '.join(outputs)}")
@@ -0,0 +1,175 @@
+import os
+import re
+import glob
+import time
+import numpy as np
+
+from shiftml_driver import shielding_to_shift, write_shift_csv
+
+# ========== Layout ==========
+# <store>/symbols.npy              (n_atoms,) element symbols, shared by every frame
+# <store>/shard_00000.npz          names, shielding, shift, uncertainty: (n, n_atoms) each
+# <store>/committee_00000.npy      (n, n_atoms, n_committee) float32, opened lazily (mmap)
+# files are written as .<name>.tmp first and renamed, so a killed flush never leaves a shard_*.npz
+SHARD_SIZE = 256        # frames per shard
+FLUSH_SECONDS = 300     # a partly filled shard is written out after this long
+
+SHARD_NAME = re.compile(r"shard_(\d+)\.npz$")
+
+def _shard_paths(path):
+    """complete shards of a store, in shard order (leftover temporary files are ignored)"""
+    paths = [p for p in glob.glob(os.path.join(path, "shard_*.npz")) if SHARD_NAME.match(os.path.basename(p))]
+    return sorted(paths, key=_shard_id)
+
+def _shard_id(shard_path):
+    return int(SHARD_NAME.match(os.path.basename(shard_path)).group(1))
+
+def _replace_atomic(path, save):
+    """save(f) into a hidden temporary file next to path, then rename it into place"""
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    with open(tmp, "wb") as f:
+        save(f)
+    os.replace(tmp, path)
+
+class ShiftResultWriter:
+    """append ShiftML predictions frame by frame, written out in shards
+
+    A shard is written once it holds shard_size frames or its oldest frame
+    is flush_seconds old (None: size only), so a killed job loses at most
+    that much work; call close() in a finally block for the rest. Opening an
+    existing store appends after its last complete shard, so a resumed run
+    can skip the names in `done`.
+    """
+
+    def __init__(self, path, symbols, shard_size=SHARD_SIZE, keep_committee=True,
+                 flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.symbols = np.asarray(symbols)
+        self.shard_size = shard_size
+        self.flush_seconds = flush_seconds
+        self.keep_committee = keep_committee
+        os.makedirs(path, exist_ok=True)
+        symbols_path = os.path.join(path, "symbols.npy")
+        if os.path.exists(symbols_path):
+            if not np.array_equal(np.load(symbols_path), self.symbols):
+                raise ValueError(f"{path} holds a different atom list")
+        else:
+            np.save(symbols_path, self.symbols)
+        shards = _shard_paths(path)
+        # next shard number follows the last complete shard, even if earlier numbers are missing
+        self.n_shards = _shard_id(shards[-1]) + 1 if shards else 0
+        self.done = set()
+        for shard in shards:
+            with np.load(shard) as data:
+                self.done.update(data["names"].tolist())
+        self._reset()
+
+    def _reset(self):
+        self.names, self.shielding, self.shift, self.uncertainty, self.committee = [], [], [], [], []
+        self._started = None
+
+    def append(self, name, sigma, uncertainty, committee=None, shift=None):
+        """add one frame; shift defaults to shiftml_driver.shielding_to_shift(sigma)"""
+        if self._started is None:
+            self._started = time.monotonic()
+        self.names.append(name)
+        self.shielding.append(sigma)
+        self.shift.append(shielding_to_shift(self.symbols, sigma) if shift is None else shift)
+        self.uncertainty.append(uncertainty)
+        if self.keep_committee:
+            self.committee.append(committee)
+        if len(self.names) >= self.shard_size or (
+                self.flush_seconds is not None and time.monotonic() - self._started >= self.flush_seconds):
+            self.flush()
+
+    def flush(self):
+        if not self.names:
+            return
+        stem = f"{self.n_shards:05d}"
+        if self.keep_committee:
+            committee = np.array(self.committee, dtype=np.float32)
+            _replace_atomic(os.path.join(self.path, f"committee_{stem}.npy"), lambda f: np.save(f, committee))
+        # the .npz goes last: a shard only counts as written once it exists
+        _replace_atomic(os.path.join(self.path, f"shard_{stem}.npz"),
+                        lambda f: np.savez(f,
+                                           names=np.array(self.names),
+                                           shielding=np.array(self.shielding, dtype=np.float64),
+                                           shift=np.array(self.shift, dtype=np.float64),
+                                           uncertainty=np.array(self.uncertainty, dtype=np.float64)))
+        self.done.update(self.names)
+        self.n_shards += 1
+        self._reset()
+
+    def close(self):
+        self.flush()
+
+class ShiftResults:
+    """read side of a shift store: every frame stacked into (n_frames, n_atoms) arrays"""
+
+    def __init__(self, path):
+        self.path = path
+        self.symbols = np.load(os.path.join(path, "symbols.npy"))
+        names, shielding, shift, uncertainty, self._shard_sizes = [], [], [], [], []
+        shards = _shard_paths(path)
+        self._shard_ids = [_shard_id(shard) for shard in shards]
+        for shard in shards:
+            with np.load(shard) as data:
+                names.append(data["names"])
+                shielding.append(data["shielding"])
+                shift.append(data["shift"])
+                uncertainty.append(data["uncertainty"])
+                self._shard_sizes.append(len(data["names"]))
+        n_atoms = len(self.symbols)
+        self.names = np.concatenate(names).tolist() if names else []
+        self.shielding = np.concatenate(shielding) if shielding else np.empty((0, n_atoms))
+        self.shift = np.concatenate(shift) if shift else np.empty((0, n_atoms))
+        self.uncertainty = np.concatenate(uncertainty) if uncertainty else np.empty((0, n_atoms))
+        self._offsets = np.concatenate([[0], np.cumsum(self._shard_sizes)]).astype(int)
+        self._committee = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def committee_shard(self, k):
+        """committee predictions of the k-th shard, memory-mapped on first use"""
+        if k not in self._committee:
+            self._committee[k] = np.load(os.path.join(self.path, f"committee_{self._shard_ids[k]:05d}.npy"),
+                                         mmap_mode="r")
+        return self._committee[k]
+
+    def committee(self, i):
+        """(n_atoms, n_committee) committee predictions of frame i"""
+        k = int(np.searchsorted(self._offsets, i, side="right") - 1)
+        return self.committee_shard(k)[i - self._offsets[k]]
+
+    def iter_committee(self):
+        """yield (frame slice, committee block) shard by shard, for batched analyses"""
+        for k in range(len(self._shard_sizes)):
+            yield slice(self._offsets[k], self._offsets[k + 1]), self.committee_shard(k)
+
+# ========== CSV compatibility ==========
+def export_csv(results, folder, indices=None):
+    """write per-structure {name}_ShiftML_results.csv files as run_shiftml.py used to"""
+    os.makedirs(folder, exist_ok=True)
+    for i in range(len(results)) if indices is None else indices:
+        write_shift_csv(os.path.join(folder, f"{results.names[i]}_ShiftML_results.csv"),
+                        results.symbols, results.shielding[i], results.shift[i],
+                        results.uncertainty[i])
+
+def import_csv_dir(folder, path, shard_size=SHARD_SIZE):
+    """pack existing *_ShiftML_results.csv files into a shift store (no committee)"""
+    files = sorted(f for f in os.listdir(folder) if f.endswith("_ShiftML_results.csv"))
+    writer = None
+    for fname in files:
+        with open(os.path.join(folder, fname), "r") as f:
+            rows = [line.rstrip("\r\n").split(",") for line in f.readlines()[1:]]
+        symbols = [r[1] for r in rows]
+        sigma = np.array([r[2] for r in rows], dtype=float)
+        shift = np.array([r[3] if r[3] else "nan" for r in rows], dtype=float)
+        unc = np.array([r[4] for r in rows], dtype=float)
+        if writer is None:
+            writer = ShiftResultWriter(path, symbols, shard_size, keep_committee=False, flush_seconds=None)
+        writer.append(fname[:-len("_ShiftML_results.csv")], sigma, unc, shift=shift)
+    if writer is not None:
+        writer.close()
+    return ShiftResults(path)
@@ -0,0 +1,113 @@
+import hashlib
+import sqlite3
+import time
+import numpy as np
+
+# ========== Settings ==========
+COORD_DECIMALS = 4              # coordinates are rounded to 1e-4 Å before hashing
+DEFAULT_MAX_BYTES = 2 * 1024**3  # 2 GB of committee predictions
+
+def frame_key(model_name, numbers, positions, cell=None, pbc=None, decimals=COORD_DECIMALS):
+    """content hash of (model, element list, rounded coordinates, rounded cell, pbc flags)
+
+    Predictions on periodic structures depend on the cell, so the same
+    coordinates in a .cif cell and in the default 30 Å box are different
+    entries.
+    """
+    h = hashlib.sha1()
+    h.update(model_name.encode())
+    h.update(np.asarray(numbers, dtype=np.int64).tobytes())
+    for values in (positions, np.zeros((3, 3)) if cell is None else cell):
+        values = np.round(np.asarray(values, dtype=float), decimals) + 0.0   # -0.0 -> 0.0
+        h.update(np.ascontiguousarray(values).tobytes())
+    h.update(np.zeros(3, dtype=bool).tobytes() if pbc is None else np.asarray(pbc, dtype=bool).tobytes())
+    return h.hexdigest()
+
+class PredictionCache:
+    """persistent committee predictions keyed by frame_key, with LRU eviction
+
+    Entries live in one SQLite file, so a job killed mid-run keeps everything
+    committed so far and several processes can share the cache. Reads never
+    open a write transaction: the last_used stamps of hits are collected and
+    written with the next put_many / touch, one committed update per block.
+    """
+
+    def __init__(self, path, model_name, max_bytes=DEFAULT_MAX_BYTES):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path, timeout=60)
+        self._hits = []
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                key TEXT PRIMARY KEY,
+                n_atoms INTEGER,
+                n_committee INTEGER,
+                committee BLOB,
+                size INTEGER,
+                last_used REAL
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON predictions (last_used)")
+        self.db.commit()
+
+    def key(self, frame):
+        """cache key of an ase.Atoms"""
+        return frame_key(self.model_name, frame.get_atomic_numbers(), frame.get_positions(),
+                         frame.get_cell()[:], frame.get_pbc())
+
+    def get(self, key):
+        """committee (n_atoms, n_committee) or None"""
+        row = self.db.execute(
+            "SELECT n_atoms, n_committee, committee FROM predictions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._hits.append(key)
+        n_atoms, n_committee, blob = row
+        return np.frombuffer(blob, dtype=np.float64).reshape(n_atoms, n_committee)
+
+    def _touch_hits(self, now):
+        self.db.executemany("UPDATE predictions SET last_used = ? WHERE key = ?",
+                            [(now, key) for key in self._hits])
+        self._hits = []
+
+    def touch(self):
+        """write the last_used stamps of the hits since the last put_many / touch"""
+        if self._hits:
+            self._touch_hits(time.time())
+            self.db.commit()
+
+    def put_many(self, items):
+        """store [(key, committee), ...] and the pending hit stamps in one transaction, then evict if over the limit"""
+        now = time.time()
+        rows = []
+        for key, committee in items:
+            committee = np.ascontiguousarray(committee, dtype=np.float64)
+            blob = committee.tobytes()
+            rows.append((key, committee.shape[0], committee.shape[1], blob, len(blob), now))
+        self._touch_hits(now)
+        self.db.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.db.commit()
+        if rows:
+            self.evict()
+
+    def size(self):
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM predictions").fetchone()[0]
+
+    def evict(self):
+        """drop least recently used entries until the cache fits in max_bytes"""
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        doomed = []
+        for key, size in self.db.execute("SELECT key, size FROM predictions ORDER BY last_used"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self.db.executemany("DELETE FROM predictions WHERE key = ?", doomed)
+        self.db.commit()
+
+    def close(self):
+        self.touch()
+        self.db.commit()
+        self.db.close()
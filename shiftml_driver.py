@@ -0,0 +1,203 @@
+import os
+import csv
+import time
+import itertools
+import multiprocessing
+import numpy as np
+
+# ========== Shielding -> shift reference ==========
+# shift = slope * sigma + intercept, per element
+SHIFT_REFERENCE = {
+    "C": (-0.9732, 166.23),
+    "H": (-0.9024, 28.05),
+    "N": (-1.0250, 183.34),
+}
+
+def shielding_to_shift(symbols, sigma, reference=SHIFT_REFERENCE):
+    """vectorized shielding -> chemical shift; NaN for elements without a reference
+
+    sigma may be (n_atoms,) or (..., n_atoms); symbols is (n_atoms,).
+    `reference` maps element -> (slope, intercept), e.g. a GIPAW calibration
+    for CASTEP shieldings.
+    """
+    symbols = np.asarray(symbols)
+    sigma = np.asarray(sigma, dtype=float)
+    shift = np.full(sigma.shape, np.nan)
+    for element, (slope, intercept) in reference.items():
+        mask = symbols == element
+        shift[..., mask] = slope * sigma[..., mask] + intercept
+    return shift
+
+def uncertainty_to_shift(symbols, uncertainty):
+    """committee spread in shielding -> spread in chemical shift (|slope| * std)"""
+    symbols = np.asarray(symbols)
+    uncertainty = np.asarray(uncertainty, dtype=float)
+    out = np.full(uncertainty.shape, np.nan)
+    for element, (slope, _) in SHIFT_REFERENCE.items():
+        mask = symbols == element
+        out[..., mask] = abs(slope) * uncertainty[..., mask]
+    return out
+
+# ========== Model ==========
+def set_threads(n_threads):
+    """pin the intra-op thread count of torch (and the BLAS/OpenMP pools)"""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(n_threads)
+    import torch
+    torch.set_num_threads(n_threads)
+
+def load_model(name="ShiftML3", n_threads=None):
+    if n_threads:
+        set_threads(n_threads)
+    from shiftml.ase import ShiftML
+    return ShiftML(name)
+
+def predict_committee(calculator, frames):
+    """one committee pass for a batch of frames -> [(n_atoms_i, n_committee), ...]
+
+    The ShiftML3 isotropic shielding (get_cs_iso) is the committee mean, so the
+    mean and the spread are both taken from this single ensemble output instead
+    of calling the model a second time.
+    """
+    if not frames:
+        return []
+    ensemble = calculator.get_cs_iso_ensemble(frames if len(frames) > 1 else frames[0])
+    if isinstance(ensemble, (list, tuple)):
+        return [np.asarray(e, dtype=float) for e in ensemble]
+    ensemble = np.asarray(ensemble, dtype=float)
+    sizes = [len(f) for f in frames]
+    return np.split(ensemble, np.cumsum(sizes)[:-1])
+
+def summarise_committee(committee):
+    """(n_atoms, n_committee) -> (mean shielding, committee std)"""
+    return committee.mean(axis=1), committee.std(axis=1)
+
+# ========== Worker pool ==========
+_worker_model = None
+
+def _init_worker(model_name, n_threads, cores):
+    global _worker_model
+    if cores:
+        # worker k gets cores[k * n_threads : (k + 1) * n_threads] of the allowed set
+        n_workers = len(cores) // n_threads
+        k = (multiprocessing.current_process()._identity[0] - 1) % n_workers
+        os.sched_setaffinity(0, cores[k * n_threads:(k + 1) * n_threads])
+    _worker_model = load_model(model_name, n_threads=n_threads)
+
+def _worker_predict(frames):
+    return predict_committee(_worker_model, frames)
+
+def start_workers(model_name, n_workers, threads_per_worker=1, pin=True):
+    """process pool where every worker loads its own model once
+
+    n_workers * threads_per_worker should match the cores of the node
+    (e.g. 64 x 1 or 16 x 4 on a 64-core node without GPU). With pin, workers
+    are pinned to disjoint slices of the CPUs this process may run on
+    (os.sched_getaffinity, i.e. the cgroup / SLURM allocation), not to
+    absolute CPU ids; pinning is skipped if that set is too small.
+    """
+    cores = None
+    if pin and hasattr(os, "sched_getaffinity"):
+        allowed = sorted(os.sched_getaffinity(0))
+        if len(allowed) >= n_workers * threads_per_worker:
+            cores = allowed[:n_workers * threads_per_worker]
+        else:
+            print(f"[⚠️] {n_workers} x {threads_per_worker} threads > {len(allowed)} allowed cores, workers not pinned")
+    return multiprocessing.Pool(n_workers, initializer=_init_worker,
+                                initargs=(model_name, threads_per_worker, cores))
+
+# ========== Prediction stream ==========
+def _blocks(named_frames, batch_size, cache):
+    """group frames into blocks holding at most batch_size distinct frames missing from the cache"""
+    block, missing = [], set()
+    for name, frame in named_frames:
+        key = cache.key(frame) if cache is not None else None
+        committee = cache.get(key) if cache is not None else None
+        block.append((name, frame, key, committee))
+        if committee is None:
+            missing.add(key if key is not None else len(block))
+        if len(missing) >= batch_size or len(block) >= 16 * batch_size:
+            yield block
+            block, missing = [], set()
+    if block:
+        yield block
+
+def _missing(block):
+    """frames of the block to send to the model: misses, each cache key only once"""
+    frames, seen = [], set()
+    for _, frame, key, committee in block:
+        if committee is None and (key is None or key not in seen):
+            frames.append(frame)
+            seen.add(key)
+    return frames
+
+def _predict_blocks(calculator, blocks, pool, window):
+    """yield (block, committees of its missing frames), blocks in input order"""
+    if pool is None:
+        for block in blocks:
+            yield block, predict_committee(calculator, _missing(block))
+        return
+    # keep at most `window` blocks in flight so the input is never read ahead in full
+    while True:
+        group = list(itertools.islice(blocks, window))
+        if not group:
+            return
+        yield from zip(group, pool.imap(_worker_predict, [_missing(b) for b in group]))
+
+def iter_predictions(calculator, named_frames, batch_size=8, cache=None, pool=None,
+                     in_flight=64):
+    """yield (name, frame, sigma, uncertainty, committee) for every frame, in input order
+
+    named_frames is an iterable of (name, ase.Atoms); frames are sent to the
+    model `batch_size` at a time, either to `calculator` or, if `pool` (from
+    start_workers) is given, spread over the worker processes with at most
+    `in_flight` batches queued. With a
+    shiftml_cache.PredictionCache, frames whose geometry is already cached
+    skip the model and new predictions are stored. Throughput is printed
+    after every batch.
+    """
+    done, hits, t0 = 0, 0, time.perf_counter()
+    blocks = _blocks(named_frames, batch_size, cache)
+    for block, committees in _predict_blocks(calculator, blocks, pool, in_flight):
+        committees = iter(committees)
+        new, predicted = [], {}
+        for name, frame, key, committee in block:
+            if committee is None and key in predicted:
+                committee = predicted[key]   # same geometry as an earlier miss of this block
+            elif committee is None:
+                committee = next(committees)
+                new.append((key, committee))
+                if key is not None:
+                    predicted[key] = committee
+            sigma, uncertainty = summarise_committee(committee)
+            yield name, frame, sigma, uncertainty, committee
+        if cache is not None:
+            cache.put_many(new)   # also stamps the cache hits of this block
+        done += len(block)
+        hits += len(block) - len(new)
+        rate = done / (time.perf_counter() - t0)
+        print(f"{done} frames done ({hits} from cache), {rate:.2f} frames/s")
+
+# ========== Output ==========
+def write_shift_csv(output_csv, symbols, sigma, shift, uncertainty):
+    """per-atom table in the original run_shiftml.py CSV format
+
+    Written to a temporary file first, so a killed job never leaves a
+    truncated CSV behind that a resumed run would skip.
+    """
+    tmp_csv = output_csv + ".tmp"
+    with open(tmp_csv, mode="w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "Atom Index", "Atom Type",
+            "Shielding (ppm)", "Chemical Shift (ppm)", "Uncertainty (ppm)"
+        ])
+        for i, (atom_type, s, cs, unc) in enumerate(zip(symbols, sigma, shift, uncertainty)):
+            writer.writerow([
+                i + 1,
+                atom_type,
+                f"{s:.6f}",
+                f"{cs:.6f}" if not np.isnan(cs) else "",
+                f"{unc:.6f}"
+            ])
+    os.replace(tmp_csv, output_csv)
@@ -0,0 +1,140 @@
+import json
+import numpy as np
+
+# ========== Molecule templates ==========
+# atom numbers are 1-based and local to the molecule (as in its .itp)
+HPMCAS_CHAIN = {
+    "name": "HPMCAS",
+    "n_atoms": 109,
+    # substituent oxygens the API amide N-H can donate to
+    "substituents": {
+        "M": [23, 35, 48, 50, 37, 52],
+        "P": [47],
+        "A": [42],
+        "S": [28, 32, 33],
+        "O6P": [43],
+        "O6A": [39],
+        "O6S": [26],
+    },
+}
+
+PARACETAMOL = {
+    "name": "API",
+    "n_atoms": 20,
+    "sites": {
+        "donor_N": 15,          # amide N
+        "donor_H_for_N": 18,    # amide N-H
+        "acceptor_O": 16,       # amide C=O O
+        "donor_H": 1,           # phenolic OH H
+        "donor_H_parentO": 7,   # phenolic OH O
+    },
+}
+
+SITE_KEYS = ("donor_N", "donor_H_for_N", "acceptor_O", "donor_H", "donor_H_parentO")
+
+# ========== H-bond class bitmask ==========
+# fixed bit of every substituent label and flag in the "Hbond_class" column;
+# unlike the descriptor's own mask these do not depend on the label order,
+# so plots and statistics classify any results CSV with integer bit tests
+CLASS_BITS = {
+    "S": 1 << 0,
+    "M": 1 << 1,
+    "A": 1 << 2,
+    "P": 1 << 3,
+    "O6S": 1 << 4,
+    "O6M": 1 << 5,
+    "O6A": 1 << 6,
+    "O6P": 1 << 7,
+    "cyclic": 1 << 8,      # cyclic H-bond rule satisfied
+    "no_hbond": 1 << 9,    # the API forms no H-bond at any of its three sites
+}
+# a substituent and its O6 ester oxygen count as the same class in the plots
+CLASS_GROUPS = {key: CLASS_BITS[key] | CLASS_BITS["O6" + key] for key in ("S", "M", "A", "P")}
+SUBSTITUENT_BITS = sum(CLASS_BITS[key] for key in CLASS_BITS if key not in ("cyclic", "no_hbond"))
+
+# ========== Descriptors ==========
+def build_system(n_chains, n_api=1, cyclic=(), chain=HPMCAS_CHAIN, api=PARACETAMOL):
+    """descriptor for n_chains polymer chains followed by n_api APIs
+
+    Molecules are laid out in the same order as [ molecules ] in topol.top.
+    `cyclic` lists chain-local (X, H) pairs: the frame counts as a cyclic
+    H-bond when the API N-H donates to atom X of a chain and H of the same
+    chain donates to the API C=O. H = None accepts any donor to the C=O.
+    """
+    return {
+        "molecules": [chain] * n_chains + [api] * n_api,
+        "cyclic": [list(pair) for pair in cyclic],
+    }
+
+def load_system(path):
+    """descriptor from a JSON file with the same layout as build_system()"""
+    with open(path, "r") as f:
+        return json.load(f)
+
+def compile_system(descriptor):
+    """descriptor -> integer index / bitmask arrays (0-based global atom indices)
+
+      sites         (n_api, 5) API site atoms, columns in SITE_KEYS order (1-based)
+      labels        substituent labels, bit k of a mask is labels[k]
+      atom_bits     (n_atoms,) substituent bitmask of every atom
+      class_bits    (n_atoms,) the same in CLASS_BITS positions (0 for other labels)
+      cyclic_X      (n_rules,) N-H acceptor of each cyclic rule
+      cyclic_H      (n_rules,) donor H of each rule, -1 = any donor
+    """
+    labels, sites, atom_bits, class_bits = [], [], [], []
+    cyclic_X, cyclic_H = [], []
+    offset = 0
+    for mol in descriptor["molecules"]:
+        bits = np.zeros(mol["n_atoms"], dtype=np.int64)
+        cbits = np.zeros(mol["n_atoms"], dtype=np.int64)
+        for label, atoms in mol.get("substituents", {}).items():
+            if label not in labels:
+                labels.append(label)
+            bits[np.asarray(atoms) - 1] |= 1 << labels.index(label)
+            cbits[np.asarray(atoms) - 1] |= CLASS_BITS.get(label, 0)
+        atom_bits.append(bits)
+        class_bits.append(cbits)
+        if "sites" in mol:
+            sites.append([mol["sites"][key] + offset for key in SITE_KEYS])
+        if "substituents" in mol:
+            for x, h in descriptor.get("cyclic", []):
+                cyclic_X.append(x - 1 + offset)
+                cyclic_H.append(h - 1 + offset if h is not None else -1)
+        offset += mol["n_atoms"]
+
+    return {
+        "n_atoms": offset,
+        "sites": np.array(sites, dtype=int).reshape(-1, len(SITE_KEYS)),
+        "labels": labels,
+        "atom_bits": np.concatenate(atom_bits),
+        "class_bits": np.concatenate(class_bits),
+        "cyclic_X": np.array(cyclic_X, dtype=int),
+        "cyclic_H": np.array(cyclic_H, dtype=int),
+    }
+
+# ========== Vectorized lookups ==========
+def substituent_mask(system, hits_N):
+    """OR of the substituent bits of every atom the API N-H donates to"""
+    return int(np.bitwise_or.reduce(system["atom_bits"][hits_N], initial=0))
+
+def substituent_string(system, mask):
+    """bitmask -> "M,S" style string, labels in descriptor order"""
+    return ",".join(label for k, label in enumerate(system["labels"]) if mask >> k & 1)
+
+def is_cyclic(system, hits_N, hits_O_H):
+    """any cyclic rule satisfied by the N-H acceptors and the H donors to C=O"""
+    if system["cyclic_X"].size == 0:
+        return False
+    x_ok = np.isin(system["cyclic_X"], hits_N)
+    h_ok = np.where(system["cyclic_H"] < 0, len(hits_O_H) > 0,
+                    np.isin(system["cyclic_H"], hits_O_H))
+    return bool(np.any(x_ok & h_ok))
+
+def hbond_class(system, hits_N, cyclic, any_hbond):
+    """CLASS_BITS mask of one API: substituents the N-H donates to, plus the cyclic / no-H-bond flags"""
+    mask = int(np.bitwise_or.reduce(system["class_bits"][hits_N], initial=0))
+    if cyclic:
+        mask |= CLASS_BITS["cyclic"]
+    if not any_hbond:
+        mask |= CLASS_BITS["no_hbond"]
+    return mask
@@ -0,0 +1,57 @@
+import numpy as np
+
+from castep_io import read_cell_symbols, read_magres
+
+# interleaved input order, as in the .cell files castep_jobs.py writes
+SYMBOLS = ["C", "H", "O", "C", "H", "H", "C"]
+SIGMA = [150.0, 30.1, 250.0, 160.0, 30.2, 30.3, 170.0]
+
+CELL = """%BLOCK LATTICE_CART
+ang
+30.0 0.0 0.0
+0.0 30.0 0.0
+0.0 0.0 30.0
+%ENDBLOCK LATTICE_CART
+
+%BLOCK POSITIONS_ABS
+ang
+""" + "".join(f"{s} {k:.1f} 0.0 0.0\n" for k, s in enumerate(SYMBOLS)) + "%ENDBLOCK POSITIONS_ABS\n"
+
+def _magres(symbols, sigma):
+    """magres written the way CASTEP does: atoms grouped by species"""
+    counts, index = {}, []
+    for s in symbols:
+        counts[s] = counts.get(s, 0) + 1
+        index.append(counts[s])
+    order = sorted(range(len(symbols)), key=lambda k: (symbols[k], index[k]))
+    lines = ["#$magres-abinitio-v1.0", "[atoms]", "units atom Angstrom"]
+    lines += [f"atom {symbols[k]} {symbols[k]} {index[k]} {k:.1f} 0.0 0.0" for k in order]
+    lines += ["[/atoms]", "<magres>", "units ms ppm"]
+    for k in order:
+        t = np.diag([sigma[k] - 5, sigma[k], sigma[k] + 5]) + np.triu(np.ones((3, 3)), 1)
+        lines.append(f"ms {symbols[k]} {index[k]} " + " ".join(f"{v:.6f}" for v in t.ravel()))
+    lines += ["</magres>"]
+    return "\n".join(lines) + "\n"
+
+def test_cell_symbols(tmp_path):
+    (tmp_path / "frame.cell").write_text(CELL)
+    assert read_cell_symbols(tmp_path / "frame.cell") == SYMBOLS
+
+def test_magres_back_to_input_order(tmp_path):
+    (tmp_path / "frame.magres").write_text(_magres(SYMBOLS, SIGMA))
+    symbols, sigma = read_magres(str(tmp_path / "frame.magres"), SYMBOLS)
+    assert symbols == SYMBOLS
+    np.testing.assert_allclose(sigma, SIGMA)
+
+def test_magres_order_from_sibling_cell(tmp_path):
+    (tmp_path / "frame.magres").write_text(_magres(SYMBOLS, SIGMA))
+    (tmp_path / "frame.cell").write_text(CELL)
+    symbols, sigma = read_magres(str(tmp_path / "frame.magres"))
+    assert symbols == SYMBOLS
+    np.testing.assert_allclose(sigma, SIGMA)
+
+def test_magres_without_cell_keeps_file_order(tmp_path):
+    (tmp_path / "frame.magres").write_text(_magres(SYMBOLS, SIGMA))
+    symbols, sigma = read_magres(str(tmp_path / "frame.magres"))
+    assert symbols == sorted(SYMBOLS)
+    np.testing.assert_allclose(sigma, [150.0, 160.0, 170.0, 30.1, 30.2, 30.3, 250.0])
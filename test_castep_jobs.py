@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+
+from castep_jobs import QUEUE_FILE, generate_jobs, job_finished, run_queue
+
+FINISHED = "Final energy, E             =  -123.45     eV\n Total time          =    1.00 s\n"
+
+# stand-in for `mpirun -np N castep.mpi <seed>`, run in <job_dir>/<seed>
+STUB = """import os, sys, time
+np_, seed, shared = sys.argv[1], sys.argv[2], sys.argv[3]
+with open("attempts", "a") as f:
+    f.write(np_ + "\\n")
+n_attempts = len(open("attempts").read().split())
+# count runs in flight to check the packing
+marker = os.path.join(shared, seed)
+open(marker, "w").close()
+time.sleep(0.2)
+with open(os.path.join(shared, "concurrency.log"), "a") as f:
+    f.write(f"{len([p for p in os.listdir(shared) if not p.endswith('.log')])}\\n")
+os.remove(marker)
+with open(f"{seed}.castep", "a") as f:
+    f.write(f"attempt {n_attempts}\\n")
+    if seed == "frame_once" and n_attempts == 1:
+        sys.exit(1)                       # crashes once, then works
+    if seed == "frame_unfinished":
+        sys.exit(0)                       # exits cleanly but never writes the summary
+    f.write(%r)
+""" % FINISHED
+
+def _jobs(tmp_path):
+    param = tmp_path / "template.param"
+    param.write_text("task : singlepoint\ncut_off_energy : 800 eV\n")
+    job_dir = str(tmp_path / "jobs")
+    coords = np.array([[0.0, 0.0, 0.0], [1.1, 0.0, 0.0]])
+    frames = [(name, coords, ["C", "H"]) for name in
+              ("frame_done", "frame_once", "frame_ok", "frame_unfinished")]
+    seeds = generate_jobs(frames, job_dir, str(param))
+    with open(os.path.join(job_dir, "frame_done", "frame_done.castep"), "w") as f:
+        f.write(FINISHED)
+    stub = tmp_path / "stub.py"
+    stub.write_text(STUB)
+    shared = tmp_path / "running"
+    shared.mkdir()
+    command = f"{sys.executable} {stub} {{np}} {{seed}} {shared}"
+    return job_dir, seeds, command, shared
+
+def _attempts(job_dir, seed):
+    path = os.path.join(job_dir, seed, "attempts")
+    return open(path).read().split() if os.path.exists(path) else []
+
+def test_run_queue_retries_skips_and_resubmits(tmp_path):
+    job_dir, seeds, command, shared = _jobs(tmp_path)
+    with open(os.path.join(job_dir, QUEUE_FILE)) as f:
+        assert f.read().split() == seeds
+
+    failed = run_queue(job_dir, command=command, total_cores=4, cores_per_task=2,
+                       max_retries=2, poll=0.02)
+    assert failed == ["frame_unfinished"]
+    assert _attempts(job_dir, "frame_done") == []                # finished before: never started
+    assert _attempts(job_dir, "frame_once") == ["2", "2"]         # failed once, retried with -np 2
+    assert _attempts(job_dir, "frame_ok") == ["2"]
+    assert len(_attempts(job_dir, "frame_unfinished")) == 3       # 1 + max_retries
+    assert all(job_finished(job_dir, s) for s in ("frame_done", "frame_once", "frame_ok"))
+    assert not job_finished(job_dir, "frame_unfinished")
+    concurrency = [int(n) for n in (shared / "concurrency.log").read_text().split()]
+    assert max(concurrency) == 2                                  # 4 cores / 2 per run
+
+    # resubmitting the same queue only reruns what has not finished
+    failed = run_queue(job_dir, command=command, total_cores=4, cores_per_task=2,
+                       max_retries=0, poll=0.02)
+    assert failed == ["frame_unfinished"]
+    assert _attempts(job_dir, "frame_once") == ["2", "2"]
+    assert _attempts(job_dir, "frame_ok") == ["2"]
+    assert len(_attempts(job_dir, "frame_unfinished")) == 4
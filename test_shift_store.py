@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+
+from shift_store import ShiftResults, ShiftResultWriter
+
+SYMBOLS = ["C", "H", "O"]
+
+def _append(writer, names):
+    for name in names:
+        k = int(name.split("_")[1])
+        writer.append(name, np.full(3, float(k)), np.full(3, 0.1), np.full((3, 2), float(k)))
+
+def test_resume_ignores_leftover_temporary_files(tmp_path):
+    store = str(tmp_path / "store")
+    writer = ShiftResultWriter(store, SYMBOLS, shard_size=2, flush_seconds=None)
+    _append(writer, ["frame_0", "frame_1", "frame_2", "frame_3"])
+    writer.close()
+    # a job killed in the middle of writing shard 2: a truncated and a complete, never renamed file
+    with open(os.path.join(store, ".shard_00002.npz.tmp"), "wb") as f:
+        f.write(b"PK\x03\x04 truncated")
+    os.replace(os.path.join(store, "shard_00001.npz"), os.path.join(store, ".shard_00001.npz.tmp"))
+    # an old-style leftover that still matches shard_*.npz
+    with open(os.path.join(store, "shard_00003.tmp.npz"), "wb") as f:
+        f.write(b"PK\x03\x04 truncated")
+
+    writer = ShiftResultWriter(store, SYMBOLS, shard_size=2, flush_seconds=None)
+    assert writer.done == {"frame_0", "frame_1"}
+    _append(writer, ["frame_2", "frame_3", "frame_4"])
+    writer.close()
+
+    results = ShiftResults(store)
+    assert results.names == ["frame_0", "frame_1", "frame_2", "frame_3", "frame_4"]
+    np.testing.assert_array_equal(results.shielding[:, 0], [0, 1, 2, 3, 4])
+    for i in range(len(results)):
+        np.testing.assert_array_equal(results.committee(i), np.full((3, 2), float(i)))
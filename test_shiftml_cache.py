@@ -0,0 +1,42 @@
+import numpy as np
+from ase import Atoms
+
+from shiftml_cache import PredictionCache
+from shiftml_driver import iter_predictions
+
+def _frame(x=0.0, cell=30.0, pbc=True):
+    return Atoms("CH", positions=[[x, 0.0, 0.0], [x + 1.1, 0.0, 0.0]], cell=[cell] * 3, pbc=pbc)
+
+class CountingModel:
+    """stand-in for the ShiftML calculator: committee values from the x coordinate"""
+
+    def __init__(self):
+        self.frames = 0
+
+    def get_cs_iso_ensemble(self, frames):
+        frames = frames if isinstance(frames, list) else [frames]
+        self.frames += len(frames)
+        return [np.full((len(f), 4), f.positions[0, 0] + f.cell[0, 0]) for f in frames]
+
+def test_key_includes_cell_and_pbc(tmp_path):
+    cache = PredictionCache(str(tmp_path / "cache.sqlite"), "ShiftML3")
+    key = cache.key(_frame())
+    assert cache.key(_frame()) == key
+    assert cache.key(_frame(cell=25.0)) != key
+    assert cache.key(_frame(pbc=False)) != key
+    assert cache.key(_frame(x=1e-6)) == key          # below the rounding
+    cache.close()
+
+def test_identical_misses_predicted_once(tmp_path):
+    cache = PredictionCache(str(tmp_path / "cache.sqlite"), "ShiftML3")
+    model = CountingModel()
+    frames = [("a", _frame()), ("b", _frame(x=2.0)), ("c", _frame()), ("d", _frame(cell=25.0))]
+    out = list(iter_predictions(model, frames, batch_size=8, cache=cache))
+    assert model.frames == 3                         # "c" repeats "a"; "d" differs only by its cell
+    assert [name for name, *_ in out] == ["a", "b", "c", "d"]
+    sigma = {name: s[0] for name, _, s, _, _ in out}
+    assert sigma == {"a": 30.0, "b": 32.0, "c": 30.0, "d": 25.0}
+
+    list(iter_predictions(model, frames, batch_size=8, cache=cache))
+    assert model.frames == 3                         # second pass is all cache hits
+    cache.close()
@@ -0,0 +1,108 @@
+import os
+from functools import lru_cache
+import numpy as np
+
+# ========== Element from mass ==========
+# nearest integer mass -> element, for [ atoms ] entries of the .itp files
+MASS_ELEMENTS = {1: "H", 12: "C", 14: "N", 16: "O", 19: "F", 31: "P", 32: "S", 35: "Cl"}
+POLAR_ELEMENTS = ("O", "N")
+
+def _element(atom_name, mass):
+    if mass is not None and round(mass) in MASS_ELEMENTS:
+        return MASS_ELEMENTS[round(mass)]
+    return atom_name.lstrip("0123456789")[:1].upper()
+
+# ========== GROMACS .top / .itp ==========
+def _read_lines(path):
+    """data lines of a .top/.itp with #include files expanded in place"""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r") as f:
+        for line in f:
+            line = line.split(";", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith("#include"):
+                inc = line.split(None, 1)[1].strip().strip('"<>')
+                inc_path = inc if os.path.isabs(inc) else os.path.join(base, inc)
+                if os.path.exists(inc_path):
+                    yield from _read_lines(inc_path)
+                # force-field includes (e.g. amber99.ff/...) are not needed for bonds
+                continue
+            if line.startswith("#"):
+                continue
+            yield line
+
+def read_topology(top_path):
+    """parse a GROMACS topology -> (elements, bonds) for the whole system
+
+    elements: list of element symbols in the order of [ molecules ]
+    bonds:    (n_bonds, 2) int array of 0-based global atom indices
+    """
+    molecules = {}      # name -> {"elements": [...], "bonds": [(i, j), ...]} (0-based, local)
+    system = []         # [(name, count), ...]
+    section, current = None, None
+
+    for line in _read_lines(top_path):
+        if line.startswith("["):
+            section = line.strip("[] ").lower()
+            continue
+        parts = line.split()
+        if section == "moleculetype":
+            current = molecules.setdefault(parts[0], {"elements": [], "bonds": []})
+        elif section == "atoms" and current is not None:
+            mass = float(parts[7]) if len(parts) > 7 else None
+            current["elements"].append(_element(parts[4], mass))
+        elif section == "bonds" and current is not None:
+            current["bonds"].append((int(parts[0]) - 1, int(parts[1]) - 1))
+        elif section == "molecules":
+            system.append((parts[0], int(parts[1])))
+
+    elements, bonds = [], []
+    for name, count in system:
+        if name not in molecules:
+            raise ValueError(f"{top_path}: molecule {name} has no [ moleculetype ] definition")
+        mol = molecules[name]
+        for _ in range(count):
+            offset = len(elements)
+            elements.extend(mol["elements"])
+            bonds.extend((i + offset, j + offset) for i, j in mol["bonds"])
+    return elements, np.array(bonds, dtype=int).reshape(-1, 2)
+
+# ========== H-bond graph ==========
+@lru_cache(maxsize=None)
+def load_hbond_graph(top_path):
+    """donor/acceptor index arrays for the system in top_path (cached per process)
+
+    Returns a dict of 0-based index arrays:
+      donor_H, donor_D  covalent D-H pairs (D = O/N), sorted by H then D
+      acceptors         every O/N atom
+      hydrogens         every H atom
+    """
+    elements, bonds = read_topology(top_path)
+    elements = np.asarray(elements)
+    polar = np.isin(elements, POLAR_ELEMENTS)
+    hydrogen = elements == "H"
+
+    # orient every bond as (H, heavy atom) and keep the D-H ones
+    a, b = bonds[:, 0], bonds[:, 1]
+    pair_H = np.concatenate([a[hydrogen[a] & polar[b]], b[hydrogen[b] & polar[a]]])
+    pair_D = np.concatenate([b[hydrogen[a] & polar[b]], a[hydrogen[b] & polar[a]]])
+    order = np.lexsort((pair_D, pair_H))
+
+    graph = {
+        "elements": elements,
+        "donor_H": pair_H[order],
+        "donor_D": pair_D[order],
+        "acceptors": np.flatnonzero(polar),
+        "hydrogens": np.flatnonzero(hydrogen),
+    }
+    for arr in graph.values():
+        arr.flags.writeable = False
+    return graph
+
+def donor_pairs(top_path, n_atoms):
+    """(donor_H, donor_D) from the topology, checked against a frame of n_atoms"""
+    graph = load_hbond_graph(top_path)
+    if len(graph["elements"]) != n_atoms:
+        raise ValueError(f"{top_path} describes {len(graph['elements'])} atoms, frame has {n_atoms}")
+    return graph["donor_H"], graph["donor_D"]